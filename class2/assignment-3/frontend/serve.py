@@ -0,0 +1,134 @@
+"""Production launcher for the Flask apps in this repo.
+
+Runs an app under gunicorn's pre-fork server instead of the Werkzeug
+development server started by `app.run()`:
+
+- worker count is derived from the container's CPU quota (the `cpus:`
+  limit in docker-compose / `docker run --cpus`), not the host's cores
+- the app is imported once in the master and then forked (preload)
+- `kill -HUP <master pid>` gracefully replaces all workers (to pick up
+  new code with preload on, set SERVER_PRELOAD=0 or restart the container)
+
+Usage:
+    python serve.py app:app --port 5000
+
+Environment overrides:
+    WEB_CONCURRENCY             number of worker processes
+    SERVER_THREADS              threads per worker (gthread worker when > 1)
+    SERVER_WORKER_CLASS         gunicorn worker class, e.g. uvicorn.workers.UvicornWorker
+    SERVER_PRELOAD              1/0, import the app before forking (default 1)
+    SERVER_TIMEOUT              seconds before a silent worker is killed (default 30)
+    SERVER_GRACEFUL_TIMEOUT     seconds a worker gets to finish in-flight requests on restart (default 30)
+    SERVER_MAX_REQUESTS         recycle a worker after this many requests (default 0 = never)
+    SERVER_MAX_REQUESTS_JITTER  random 0..N added to SERVER_MAX_REQUESTS per worker so they
+                                do not all restart at once (default 0)
+
+Every app directory is its own Docker build context, so an identical copy
+of this file sits next to each app.py.
+"""
+import argparse
+import math
+import os
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+
+def cgroup_cpu_limit():
+    """CPUs granted by the cgroup CPU quota, or None when unlimited"""
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    # cgroup v1: quota is -1 when unlimited
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+def available_cpus():
+    """CPUs this container may actually use (quota, then cpuset, then host)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    return min(cpus, limit) if limit else cpus
+
+def default_workers():
+    """Gunicorn's rule of thumb, (2 x cores) + 1, using the container's cores"""
+    if os.getenv('WEB_CONCURRENCY'):
+        return max(1, int(os.getenv('WEB_CONCURRENCY')))
+    return 2 * max(1, math.ceil(available_cpus())) + 1
+
+
+class StandaloneServer(BaseApplication):
+    """Gunicorn application configured from code instead of the CLI"""
+
+    def __init__(self, app_uri, options):
+        self.app_uri = app_uri
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from gunicorn.util import import_app
+        # Resolve the app module from the working directory, like the gunicorn CLI
+        if os.getcwd() not in sys.path:
+            sys.path.insert(0, os.getcwd())
+        return import_app(self.app_uri)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a WSGI/ASGI app under gunicorn')
+    parser.add_argument('app', help='module:variable, e.g. app:app')
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--worker-class', default=os.getenv('SERVER_WORKER_CLASS'))
+    args = parser.parse_args()
+
+    threads = int(os.getenv('SERVER_THREADS', 1))
+    worker_class = args.worker_class or ('gthread' if threads > 1 else 'sync')
+    options = {
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers or default_workers(),
+        'threads': threads,
+        'worker_class': worker_class,
+        'preload_app': os.getenv('SERVER_PRELOAD', '1') == '1',
+        'timeout': int(os.getenv('SERVER_TIMEOUT', 30)),
+        'graceful_timeout': int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 30)),
+        'max_requests': int(os.getenv('SERVER_MAX_REQUESTS', 0)),
+        'max_requests_jitter': int(os.getenv('SERVER_MAX_REQUESTS_JITTER', 0)),
+        'accesslog': os.getenv('SERVER_ACCESS_LOG'),
+        'errorlog': '-'
+    }
+
+    limit = cgroup_cpu_limit()
+    print("=" * 50)
+    print(f"Starting {args.app} on {options['bind']}")
+    print(f"CPU quota: {limit if limit else 'unlimited'} | Usable CPUs: {available_cpus():g}")
+    print(f"Workers: {options['workers']} x {worker_class} (threads: {threads})")
+    print(f"Preload: {options['preload_app']}")
+    print("=" * 50)
+
+    StandaloneServer(args.app, options).run()
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,15 @@
 import boto3
 import os
+import sqlite3
 import time
+from collections import deque
 from datetime import datetime, timedelta
 
+from follower import LogFollower
+from logtail import tail_lines
+from records import RecordFile, decode, format_record
+from tsdb import TSDB_PATH, TimeSeriesStore
+
 # AWS SES Configuration
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 SENDER_EMAIL = os.getenv('SENDER_EMAIL')
@@ -13,15 +20,28 @@ ALERT_COOLDOWN = int(os.getenv('ALERT_COOLDOWN', 300))  # 5 minutes
 CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', 30))   # 30 seconds
 CPU_THRESHOLD = float(os.getenv('CPU_THRESHOLD', 80))
 MEMORY_THRESHOLD = float(os.getenv('MEMORY_THRESHOLD', 80))
+# latest: check the last sample of each log every CHECK_INTERVAL
+# follow: check every sample appended since the previous check
+ALERT_MODE = os.getenv('ALERT_MODE', 'latest')
 
 # Log paths
 LOG_DIR = '/logs'
 METRICS_LOG = os.path.join(LOG_DIR, 'metrics.log')
 STATUS_LOG = os.path.join(LOG_DIR, 'status.log')
+METRICS_REC = os.path.join(LOG_DIR, 'metrics.rec')
+METRICS_RECORDS = RecordFile(METRICS_REC)
 
 # Alert tracking
 last_alert_time = {}
 
+# Follow mode: read positions and the recent lines quoted in alert emails
+metrics_follower = LogFollower(METRICS_LOG)
+status_follower = LogFollower(STATUS_LOG)
+records_follower = LogFollower(METRICS_REC)
+recent_records = deque(maxlen=10)
+recent_metrics = deque(maxlen=10)
+recent_status = deque(maxlen=5)
+
 def send_email_alert(subject, body, severity='WARNING'):
     """Send email alert via AWS SES"""
     try:
@@ -102,32 +122,59 @@ def should_send_alert(alert_type):
     
     return False
 
+def parse_metrics_line(line):
+    """Parse one metrics.log line"""
+    parts = line.split('|')
+    
+    timestamp = parts[0].strip()
+    cpu = parts[1].split(':')[1].strip().replace('%', '')
+    memory = parts[2].split(':')[1].strip().replace('%', '')
+    latency = parts[3].split(':')[1].strip().replace('s', '')
+    
+    return {
+        'timestamp': timestamp,
+        'cpu': float(cpu),
+        'memory': float(memory),
+        'latency': float(latency)
+    }
+
+def parse_status_line(line):
+    """Parse one status.log line"""
+    parts = line.split('|')
+    
+    return {
+        'timestamp': parts[0].strip(),
+        'container_status': parts[1].split(':')[1].strip(),
+        'http_code': parts[2].split(':')[1].strip()
+    }
+
+def latest_record(n):
+    """Latest structured record with the last n as recent_lines, or None without records"""
+    records = METRICS_RECORDS.last(n)
+    if not records:
+        return None
+    record = records[-1]
+    record['recent_lines'] = ''.join(format_record(r) for r in records)
+    return record
+
 def parse_metrics():
     """Parse latest metrics from log file"""
     try:
-        with open(METRICS_LOG, 'r') as f:
-            # Read last 10 lines to get recent trends
-            lines = f.readlines()[-10:]
-            
-            if not lines:
-                return None
-            
-            # Parse last line
-            last_line = lines[-1]
-            parts = last_line.split('|')
-            
-            timestamp = parts[0].strip()
-            cpu = parts[1].split(':')[1].strip().replace('%', '')
-            memory = parts[2].split(':')[1].strip().replace('%', '')
-            latency = parts[3].split(':')[1].strip().replace('s', '')
-            
-            return {
-                'timestamp': timestamp,
-                'cpu': float(cpu),
-                'memory': float(memory),
-                'latency': float(latency),
-                'recent_lines': ''.join(lines)
-            }
+        # Structured records when the monitor writes them, the text log otherwise
+        record = latest_record(10)
+        if record:
+            return record
+        
+        # Read last 10 lines to get recent trends
+        lines = tail_lines(METRICS_LOG, 10)
+        
+        if not lines:
+            return None
+        
+        # Parse last line
+        metrics = parse_metrics_line(lines[-1])
+        metrics['recent_lines'] = ''.join(lines)
+        return metrics
     
     except Exception as e:
         print(f"Error parsing metrics: {str(e)}")
@@ -136,39 +183,42 @@ def parse_metrics():
 def parse_status():
     """Parse latest status from log file"""
     try:
-        with open(STATUS_LOG, 'r') as f:
-            lines = f.readlines()[-5:]
-            
-            if not lines:
-                return None
-            
-            last_line = lines[-1]
-            parts = last_line.split('|')
-            
-            timestamp = parts[0].strip()
-            container_status = parts[1].split(':')[1].strip()
-            http_code = parts[2].split(':')[1].strip()
-            
-            return {
-                'timestamp': timestamp,
-                'container_status': container_status,
-                'http_code': http_code,
-                'recent_lines': ''.join(lines)
-            }
+        record = latest_record(5)
+        if record:
+            return record
+        
+        lines = tail_lines(STATUS_LOG, 5)
+        
+        if not lines:
+            return None
+        
+        status = parse_status_line(lines[-1])
+        status['recent_lines'] = ''.join(lines)
+        return status
     
     except Exception as e:
         print(f"Error parsing status: {str(e)}")
         return None
 
-def check_and_alert():
-    """Main alert checking logic"""
-    metrics = parse_metrics()
-    status = parse_status()
-    
-    if not metrics or not status:
-        print("⏳ Waiting for metrics...")
-        return
-    
+def history_line(metric, unit):
+    """Last hour's average and peak of a metric from the time-series store, or '' without one"""
+    if not os.path.exists(TSDB_PATH):
+        return ''
+    try:
+        store = TimeSeriesStore(TSDB_PATH, readonly=True)
+        try:
+            count, avg, peak = store.summary(metric, time.time() - 3600)
+        finally:
+            store.close()
+    except sqlite3.Error as e:
+        print(f"Error reading metric history: {str(e)}")
+        return ''
+    if not count:
+        return ''
+    return f"Last Hour: avg {avg:.2f}{unit}, max {peak:.2f}{unit} ({count} samples)"
+
+def check_status(status):
+    """Alert on one status sample, returns the alerts sent"""
     alerts = []
     
     # Check for critical: container down
@@ -205,6 +255,12 @@ Action Required: Check application logs and health.
             send_email_alert(subject, body, severity='CRITICAL')
             alerts.append('unhealthy_response')
     
+    return alerts
+
+def check_metrics(metrics):
+    """Alert on one metrics sample, returns the alerts sent"""
+    alerts = []
+    
     # Check for critical: high CPU
     if metrics['cpu'] > CPU_THRESHOLD:
         if should_send_alert('high_cpu'):
@@ -214,6 +270,7 @@ CPU Usage: {metrics['cpu']}% (Threshold: {CPU_THRESHOLD}%)
 Memory Usage: {metrics['memory']}%
 Latency: {metrics['latency']}s
 Timestamp: {metrics['timestamp']}
+{history_line('cpu', '%')}
 
 Recent Metrics:
 {metrics['recent_lines']}
@@ -232,6 +289,7 @@ Memory Usage: {metrics['memory']}% (Threshold: {MEMORY_THRESHOLD}%)
 CPU Usage: {metrics['cpu']}%
 Latency: {metrics['latency']}s
 Timestamp: {metrics['timestamp']}
+{history_line('memory', '%')}
 
 Recent Metrics:
 {metrics['recent_lines']}
@@ -250,6 +308,7 @@ Response Latency: {metrics['latency']}s (Threshold: 1.0s)
 CPU Usage: {metrics['cpu']}%
 Memory Usage: {metrics['memory']}%
 Timestamp: {metrics['timestamp']}
+{history_line('latency', 's')}
 
 Recent Metrics:
 {metrics['recent_lines']}
@@ -259,19 +318,99 @@ Action Required: Investigate slow database queries or external dependencies.
             send_email_alert(subject, body, severity='WARNING')
             alerts.append('high_latency')
     
+    return alerts
+
+def check_and_alert():
+    """Alert on the latest sample of each log"""
+    metrics = parse_metrics()
+    status = parse_status()
+    
+    if not metrics or not status:
+        print("⏳ Waiting for metrics...")
+        return
+    
+    alerts = check_status(status) + check_metrics(metrics)
+    
     # Status output
     if alerts:
         print(f"⚠️  Alerts sent: {', '.join(alerts)}")
     else:
         print(f"✅ All metrics normal | CPU: {metrics['cpu']}% | Memory: {metrics['memory']}% | Latency: {metrics['latency']}s")
 
+def follow_records():
+    """Alert on every structured record appended since the last check"""
+    alerts = []
+    samples = 0
+    record = None
+    
+    for line in records_follower.new_lines():
+        try:
+            record = decode(line)
+        except ValueError:
+            print(f"Skipping malformed record: {line.strip()}")
+            continue
+        recent_records.append(format_record(record))
+        record['recent_lines'] = ''.join(recent_records)
+        alerts.extend(check_status(record))
+        alerts.extend(check_metrics(record))
+        samples += 1
+    
+    return alerts, samples, record
+
+def follow_logs():
+    """Alert on every text log line appended since the last check"""
+    alerts = []
+    samples = 0
+    metrics = None
+    
+    for line in status_follower.new_lines():
+        recent_status.append(line)
+        try:
+            status = parse_status_line(line)
+        except (IndexError, ValueError):
+            print(f"Skipping malformed status line: {line.strip()}")
+            continue
+        status['recent_lines'] = ''.join(recent_status)
+        alerts.extend(check_status(status))
+        samples += 1
+    
+    for line in metrics_follower.new_lines():
+        recent_metrics.append(line)
+        try:
+            metrics = parse_metrics_line(line)
+        except (IndexError, ValueError):
+            print(f"Skipping malformed metrics line: {line.strip()}")
+            continue
+        metrics['recent_lines'] = ''.join(recent_metrics)
+        alerts.extend(check_metrics(metrics))
+        samples += 1
+    
+    return alerts, samples, metrics
+
+def follow_and_alert():
+    """Alert on every sample appended since the last check"""
+    if os.path.exists(METRICS_REC):
+        alerts, samples, metrics = follow_records()
+    else:
+        alerts, samples, metrics = follow_logs()
+    
+    # Status output
+    if not samples:
+        print("⏳ Waiting for new samples...")
+    elif alerts:
+        print(f"⚠️  Alerts sent: {', '.join(alerts)} ({samples} new samples)")
+    elif metrics:
+        print(f"✅ {samples} new samples normal | CPU: {metrics['cpu']}% | Memory: {metrics['memory']}% | Latency: {metrics['latency']}s")
+    else:
+        print(f"✅ {samples} new samples normal")
+
 def main():
     """Main alert service loop"""
     print("=" * 60)
     print("🔔 Alert Service Started")
     print(f"Sender: {SENDER_EMAIL}")
     print(f"Recipients: {', '.join(RECIPIENT_EMAILS)}")
-    print(f"Check Interval: {CHECK_INTERVAL}s")
+    print(f"Check Interval: {CHECK_INTERVAL}s | Mode: {ALERT_MODE}")
     print(f"Alert Cooldown: {ALERT_COOLDOWN}s")
     print(f"CPU Threshold: {CPU_THRESHOLD}%")
     print(f"Memory Threshold: {MEMORY_THRESHOLD}%")
@@ -281,9 +420,10 @@ def main():
     print("Waiting for monitoring logs...")
     time.sleep(30)
     
+    check = follow_and_alert if ALERT_MODE == 'follow' else check_and_alert
     while True:
         try:
-            check_and_alert()
+            check()
         except Exception as e:
             print(f"❌ Error in alert check: {str(e)}")
         
@@ -0,0 +1,45 @@
+import os
+
+# Incremental reader for the monitoring logs (ALERT_MODE=follow).
+#
+# Remembers how far into the file it has read and only reads what was
+# appended since, so each check costs as much as the new data. A different
+# inode means the file was replaced (rotated or recreated): start again
+# from its beginning. A file shorter than the saved offset was truncated:
+# same thing. A last line without its newline is still being written and
+# is left for the next call.
+
+
+class LogFollower:
+    """Yields the complete lines appended to a file since the previous call
+
+    The first call returns what was appended after the follower was created,
+    or the whole file with from_start (also when the file did not exist yet).
+    """
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.inode = None
+        self.offset = 0
+        if not from_start and os.path.exists(path):
+            stat = os.stat(path)
+            self.inode, self.offset = stat.st_ino, stat.st_size
+
+    def new_lines(self):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            if self.inode is not None and (stat.st_ino != self.inode or stat.st_size < self.offset):
+                print(f"🔄 {self.path} was rotated or truncated, reading it from the start")
+                self.offset = 0
+            self.inode = stat.st_ino
+
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self.offset += len(line)
+                yield line.decode('utf-8', errors='replace')
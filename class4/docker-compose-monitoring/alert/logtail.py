@@ -0,0 +1,33 @@
+import os
+
+# Tail reading for the append-only monitoring logs.
+#
+# metrics.log and status.log grow by a line every check and are never
+# rotated, so readlines() gets slower (and allocates more) the longer the
+# stack runs. Reading backwards from the end in blocks only touches the
+# last few KB, whatever the size of the file.
+#
+# Copy of monitor/logtail.py (each service has its own build context).
+
+BLOCK_SIZE = 8192
+
+
+def tail_lines(path, n=10, block_size=BLOCK_SIZE):
+    """Last n lines of a text file, read backwards from the end in blocks"""
+    if n <= 0:
+        return []
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b''
+        # n complete lines need n + 1 newlines, unless the file starts first
+        while position > 0 and data.count(b'\n') <= n:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            data = f.read(size) + data
+    return [line.decode('utf-8', errors='replace') for line in data.splitlines(keepends=True)[-n:]]
+
+def last_line(path):
+    """Last line of a text file, or None when it is empty"""
+    lines = tail_lines(path, 1)
+    return lines[0] if lines else None
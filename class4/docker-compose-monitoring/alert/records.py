@@ -0,0 +1,142 @@
+import os
+from datetime import datetime
+
+# Fixed-width metric records (metrics.rec), written by monitor.sh next to
+# metrics.log and status.log (or by collector.py).
+#
+# One sample per line, every line exactly RECORD_SIZE bytes:
+#
+#   "1760700000   25.50   40.20    0.125 200 1\n"
+#    epoch       CPU %  mem %   latency   HTTP up
+#
+# metrics.rec is the main container (CONTAINER_NAME); every other monitored
+# container has its own series in metrics-<container>.rec.
+#
+# With STATS_SOURCE=cgroup the collector also writes cgroup.rec /
+# cgroup-<container>.rec: the epoch and the CGROUP_FIELDS (pressure,
+# throttling, I/O, peaks), each in a 10-character column.
+#
+# Decoding is a split() and a few float()s, and record i starts at byte
+# i * RECORD_SIZE, so the last N samples or any single sample are one
+# seek and one read away.
+#
+# Copy of monitor/records.py (each service has its own build context).
+
+RECORD_SIZE = 42
+
+CGROUP_FIELDS = ('cpu_peak', 'throttled_pct', 'throttled_ms',
+                 'psi_cpu_some', 'psi_cpu_full', 'psi_memory_some', 'psi_memory_full', 'psi_io_some', 'psi_io_full',
+                 'io_read_mbps', 'io_write_mbps', 'memory_peak_mb')
+CGROUP_RECORD_SIZE = 10 + 10 * len(CGROUP_FIELDS) + 1
+
+
+def series_path(log_dir, container='', kind='metrics'):
+    """Record file of a container's series; '' is the main series, kind is metrics or cgroup"""
+    return os.path.join(log_dir, f"{kind}-{container}.rec" if container else f"{kind}.rec")
+
+def series_paths(log_dir, kind='metrics'):
+    """{series: path} of every record file of a kind in log_dir, the main series as ''"""
+    try:
+        names = sorted(os.listdir(log_dir))
+    except FileNotFoundError:
+        return {}
+    paths = {}
+    for name in names:
+        if name == f"{kind}.rec":
+            paths[''] = os.path.join(log_dir, name)
+        elif name.startswith(f"{kind}-") and name.endswith('.rec'):
+            paths[name[len(kind) + 1:-len('.rec')]] = os.path.join(log_dir, name)
+    return paths
+
+
+def decode(raw):
+    """One record (bytes or str) as a dict with the same keys as the parsed log lines"""
+    epoch, cpu, memory, latency, http_code, up = raw.split()
+    epoch = int(epoch)
+    return {
+        'epoch': epoch,
+        'timestamp': datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %H:%M:%S'),
+        'cpu': float(cpu),
+        'memory': float(memory),
+        'latency': float(latency),
+        'http_code': http_code.decode() if isinstance(http_code, bytes) else http_code,
+        'container_status': 'UP' if up in (b'1', '1') else 'DOWN'
+    }
+
+def encode(epoch, cpu, memory, latency, http_code, up):
+    """One record as bytes, each value clamped to its column so the size never changes"""
+    def clamp(value, high):
+        return min(max(float(value), 0.0), high)
+    return b'%10d %7.2f %7.2f %8.3f %03d %d\n' % (
+        int(epoch), clamp(cpu, 9999.99), clamp(memory, 9999.99), clamp(latency, 9999.999),
+        int(clamp(http_code, 999)), 1 if up else 0)
+
+def decode_cgroup(raw):
+    """One cgroup record as a dict of CGROUP_FIELDS plus epoch and timestamp"""
+    epoch, *values = raw.split()
+    if len(values) != len(CGROUP_FIELDS):
+        raise ValueError(f"expected {len(CGROUP_FIELDS)} cgroup fields, got {len(values)}")
+    record = dict(zip(CGROUP_FIELDS, map(float, values)))
+    record['epoch'] = int(epoch)
+    record['timestamp'] = datetime.fromtimestamp(record['epoch']).strftime('%Y-%m-%d %H:%M:%S')
+    return record
+
+def encode_cgroup(epoch, figures):
+    """One cgroup record as bytes, from a dict holding every CGROUP_FIELDS key"""
+    return b'%10d' % int(epoch) + b''.join(
+        b' %9.2f' % min(max(float(figures[field]), 0.0), 999999.99) for field in CGROUP_FIELDS) + b'\n'
+
+def format_record(record):
+    """A decoded record as a human-readable log line"""
+    return (f"{record['timestamp']} | CPU: {record['cpu']:.2f}% | Memory: {record['memory']:.2f}% | "
+            f"Latency: {record['latency']:.3f}s | Container: {record['container_status']} | "
+            f"HTTP: {record['http_code']}\n")
+
+
+class RecordFile:
+    """Random access to the records of a metrics.rec (or cgroup.rec) file by index"""
+
+    def __init__(self, path, size=RECORD_SIZE, decoder=decode):
+        self.path = path
+        self.size = size
+        self.decoder = decoder
+
+    def __len__(self):
+        """Number of complete records (0 when the file does not exist yet)"""
+        try:
+            return os.path.getsize(self.path) // self.size
+        except FileNotFoundError:
+            return 0
+
+    def read(self, start, stop=None):
+        """Records start..stop-1 (negative indexes count from the end)"""
+        count = len(self)
+        start, stop, _ = slice(start, stop).indices(count)
+        if start >= stop:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(start * self.size)
+            data = f.read((stop - start) * self.size)
+        return [self.decoder(data[offset:offset + self.size])
+                for offset in range(0, len(data) - self.size + 1, self.size)]
+
+    def __getitem__(self, index):
+        records = self.read(index, index + 1 if index != -1 else None)
+        if not records:
+            raise IndexError('record index out of range')
+        return records[0]
+
+    def last(self, n=1):
+        """The last n records, oldest first"""
+        return self.read(-n) if n > 0 else []
+
+    def find(self, epoch):
+        """Index of the first record newer than epoch (binary search, records are in time order)"""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle]['epoch'] <= epoch:
+                low = middle + 1
+            else:
+                high = middle
+        return low
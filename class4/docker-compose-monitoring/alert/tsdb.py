@@ -0,0 +1,293 @@
+import math
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from records import (CGROUP_FIELDS, CGROUP_RECORD_SIZE, RECORD_SIZE, RecordFile, decode, decode_cgroup,
+                     series_paths)
+
+# Embedded time-series store for the monitor (SQLite, /logs/metrics.db).
+#
+# Samples are stored in long format, one row per (metric, second), and
+# rolled up into 1-minute, 5-minute and 1-hour buckets with count, min,
+# max, avg and p95. Each table has its own retention, so the database
+# stays bounded however long the stack runs:
+#
+#   raw samples   TSDB_RAW_RETENTION   (default 1 day)
+#   1m rollups    TSDB_1M_RETENTION    (default 7 days)
+#   5m rollups    TSDB_5M_RETENTION    (default 30 days)
+#   1h rollups    TSDB_1H_RETENTION    (default 365 days)
+#
+# Each container is a series: the main one (metrics.rec) stores plain
+# metric names ("cpu"), the others are prefixed ("postgres-db/cpu").
+#
+# cgroup.rec files (STATS_SOURCE=cgroup) add the CGROUP_FIELDS metrics:
+# PSI stall %, CPU throttling, I/O rates and peaks.
+#
+# `python tsdb.py` is the only writer: it follows every metrics*.rec and cgroup*.rec file,
+# inserts new samples, rolls up closed buckets and deletes expired rows. The dashboard
+# and the alert service open the database read-only and call query().
+#
+# Copy of monitor/tsdb.py (each service has its own build context).
+
+LOG_DIR = os.getenv('LOG_DIR', '/logs')
+TSDB_PATH = os.getenv('TSDB_PATH', os.path.join(LOG_DIR, 'metrics.db'))
+INGEST_INTERVAL = float(os.getenv('TSDB_INGEST_INTERVAL', 5))
+COMPACT_INTERVAL = float(os.getenv('TSDB_COMPACT_INTERVAL', 600))
+# Rollups are computed from raw samples, so raw data must outlive the longest bucket
+RAW_RETENTION = max(int(os.getenv('TSDB_RAW_RETENTION', 86400)), 7200)
+ROLLUP_RETENTION = {
+    60: int(os.getenv('TSDB_1M_RETENTION', 7 * 86400)),
+    300: int(os.getenv('TSDB_5M_RETENTION', 30 * 86400)),
+    3600: int(os.getenv('TSDB_1H_RETENTION', 365 * 86400))
+}
+
+# Numeric fields of a metrics.rec record stored as metrics
+METRICS = ('cpu', 'memory', 'latency', 'http_code', 'up')
+ALL_METRICS = METRICS + CGROUP_FIELDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    metric TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (metric, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    avg REAL NOT NULL,
+    p95 REAL NOT NULL,
+    PRIMARY KEY (resolution, metric, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rollups_ts ON rollups (resolution, ts);
+"""
+
+
+def metric_name(metric, series=''):
+    """Stored name of a metric of a series ('' is the main container)"""
+    return f"{series}/{metric}" if series else metric
+
+def record_samples(record, series=''):
+    """(metric, ts, value) rows for one decoded record of a series"""
+    values = {
+        'cpu': record['cpu'],
+        'memory': record['memory'],
+        'latency': record['latency'],
+        'http_code': float(record['http_code']),
+        'up': 1.0 if record['container_status'] == 'UP' else 0.0
+    }
+    return [(metric_name(metric, series), record['epoch'], values[metric]) for metric in METRICS]
+
+def cgroup_samples(record, series=''):
+    """(metric, ts, value) rows for one decoded cgroup.rec record of a series"""
+    return [(metric_name(field, series), record['epoch'], record[field]) for field in CGROUP_FIELDS]
+
+# Record files the ingester follows: kind -> (record size, decoder, rows, metric used to resume)
+SOURCES = {
+    'metrics': (RECORD_SIZE, decode, record_samples, 'cpu'),
+    'cgroup': (CGROUP_RECORD_SIZE, decode_cgroup, cgroup_samples, CGROUP_FIELDS[0])
+}
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class TimeSeriesStore:
+    """Raw samples and min/max/avg/p95 rollups in one SQLite file"""
+
+    def __init__(self, path=TSDB_PATH, readonly=False):
+        self.path = path
+        if readonly:
+            self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+        else:
+            self.db = sqlite3.connect(path, timeout=5)
+            # Lets compact() hand freed pages back to the OS. Only takes effect on a new
+            # database; an existing one keeps its mode until enable_incremental_vacuum()
+            self.db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def enable_incremental_vacuum(self):
+        """Rebuild a database created without incremental vacuum (once, with VACUUM)
+
+        Raises sqlite3.OperationalError ('database is locked') while a reader
+        holds a transaction open; the caller tries again later.
+        """
+        if self.db.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return
+        print(f"🧹 Rebuilding {self.path} once to enable incremental vacuum", flush=True)
+        self.db.execute('VACUUM')
+
+    def latest_ts(self, metric=None):
+        """Timestamp of the newest raw sample (of one metric), or None"""
+        if metric is None:
+            return self.db.execute('SELECT MAX(ts) FROM samples').fetchone()[0]
+        return self.db.execute('SELECT MAX(ts) FROM samples WHERE metric = ?', (metric,)).fetchone()[0]
+
+    def insert(self, rows):
+        """Store (metric, ts, value) rows; a repeated (metric, ts) replaces the old value"""
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO samples (metric, ts, value) VALUES (?, ?, ?)', rows)
+
+    def rollup(self, rows=None):
+        """Compute the closed buckets of each metric that are new or got late samples
+
+        rows are the (metric, ts, value) rows just inserted; None rolls up
+        every metric. Progress is tracked per metric: a bucket is closed once
+        that metric has a sample at or after its end (each .rec file is
+        written in time order), whatever the other series have reached.
+        """
+        if rows is None:
+            oldest = {metric: None for (metric,) in self.db.execute('SELECT DISTINCT metric FROM samples')}
+        else:
+            oldest = {}
+            for metric, ts, _ in rows:
+                oldest[metric] = min(ts, oldest.get(metric, ts))
+        added = 0
+        with self.db:
+            for metric, oldest_new in oldest.items():
+                latest = self.latest_ts(metric)
+                if latest is None:
+                    continue
+                for resolution in ROLLUP_RETENTION:
+                    added += self._rollup_metric(metric, resolution, latest, oldest_new)
+        return added
+
+    def _rollup_metric(self, metric, resolution, latest, oldest_new=None):
+        last = self.db.execute('SELECT MAX(ts) FROM rollups WHERE resolution = ? AND metric = ?',
+                               (resolution, metric)).fetchone()[0]
+        if last is None:
+            start = self.db.execute('SELECT MIN(ts) FROM samples WHERE metric = ?', (metric,)).fetchone()[0]
+            start = start // resolution * resolution
+        else:
+            start = last + resolution
+        if oldest_new is not None:
+            # Samples stored after their bucket was rolled up: compute that bucket again
+            start = min(start, oldest_new // resolution * resolution)
+        end = latest // resolution * resolution
+        if start >= end:
+            return 0
+
+        buckets = {}
+        for ts, value in self.db.execute('SELECT ts, value FROM samples WHERE metric = ? AND ts >= ? AND ts < ?',
+                                         (metric, start, end)):
+            buckets.setdefault(ts // resolution * resolution, []).append(value)
+
+        rows = []
+        for bucket, values in buckets.items():
+            values.sort()
+            rows.append((resolution, metric, bucket, len(values), values[0], values[-1],
+                         sum(values) / len(values), percentile(values, 0.95)))
+        self.db.executemany('INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def compact(self, now=None):
+        """Delete rows past their retention and release the freed pages"""
+        now = now or time.time()
+        with self.db:
+            deleted = self.db.execute('DELETE FROM samples WHERE ts < ?', (now - RAW_RETENTION,)).rowcount
+            for resolution, retention in ROLLUP_RETENTION.items():
+                deleted += self.db.execute('DELETE FROM rollups WHERE resolution = ? AND ts < ?',
+                                           (resolution, now - retention)).rowcount
+        # executescript, not execute: the sqlite3 module steps a pragma once, which frees a single page
+        self.db.executescript('PRAGMA incremental_vacuum;')
+        return deleted
+
+    @staticmethod
+    def pick_resolution(start, end, now=None):
+        """Finest resolution that keeps a query over start..end to a few hundred points
+
+        0 means raw samples. A coarser one is used when the finer data has
+        already expired for part of the range.
+        """
+        now = now or time.time()
+        span = end - start
+        if span <= 3600 and start >= now - RAW_RETENTION:
+            return 0
+        for resolution, max_span in ((60, 86400), (300, 7 * 86400)):
+            if span <= max_span and start >= now - ROLLUP_RETENTION[resolution]:
+                return resolution
+        return 3600
+
+    def query(self, metric, start, end=None, resolution='auto'):
+        """Points of one metric between start and end (epoch seconds), oldest first
+
+        Each point is {'ts', 'count', 'min', 'max', 'avg', 'p95'}; raw samples
+        have count 1 and the same value in every field.
+        """
+        end = end or time.time()
+        if resolution == 'auto':
+            resolution = self.pick_resolution(start, end)
+        if resolution == 0:
+            rows = self.db.execute(
+                'SELECT ts, 1, value, value, value, value FROM samples '
+                'WHERE metric = ? AND ts >= ? AND ts < ? ORDER BY ts', (metric, start, end))
+        else:
+            rows = self.db.execute(
+                'SELECT ts, count, min, max, avg, p95 FROM rollups '
+                'WHERE resolution = ? AND metric = ? AND ts >= ? AND ts < ? ORDER BY ts',
+                (resolution, metric, start, end))
+        return [dict(zip(('ts', 'count', 'min', 'max', 'avg', 'p95'), row)) for row in rows]
+
+    def summary(self, metric, since):
+        """(count, avg, max) of the raw samples of a metric since an epoch time"""
+        return self.db.execute('SELECT COUNT(*), AVG(value), MAX(value) FROM samples WHERE metric = ? AND ts >= ?',
+                               (metric, since)).fetchone()
+
+
+def ingest_forever():
+    """Follow every series' record file into the store, rolling up and compacting as it goes"""
+    store = TimeSeriesStore(TSDB_PATH)
+    next_index = {}  # (kind, series) -> index of the next record to ingest
+    last_compact = 0
+    vacuum_enabled = False
+
+    print(f"🗄️  Time-series store {TSDB_PATH} ingesting {LOG_DIR}/*.rec every {INGEST_INTERVAL:g}s", flush=True)
+    while True:
+        try:
+            rows = []
+            for kind, (size, decoder, samples, resume_metric) in SOURCES.items():
+                for series, path in series_paths(LOG_DIR, kind).items():
+                    records = RecordFile(path, size, decoder)
+                    count = len(records)
+                    index = next_index.get((kind, series))
+                    if index is None or count < index:
+                        # Start (or restart after truncation) just after the series' newest stored sample
+                        latest = store.latest_ts(metric_name(resume_metric, series))
+                        if index is None:
+                            print(f"➕ Series {kind} {series or '(main)'}", flush=True)
+                        index = records.find(latest) if latest is not None else 0
+                    if count > index:
+                        for record in records.read(index, count):
+                            rows.extend(samples(record, series))
+                    next_index[(kind, series)] = count
+            if rows:
+                store.insert(rows)
+                store.rollup(rows)
+            if time.time() - last_compact >= COMPACT_INTERVAL:
+                if not vacuum_enabled:
+                    try:
+                        store.enable_incremental_vacuum()
+                        vacuum_enabled = True
+                    except sqlite3.OperationalError as e:
+                        print(f"⚠️  VACUUM postponed to the next compaction: {str(e)}", flush=True)
+                deleted = store.compact()
+                last_compact = time.time()
+                if deleted:
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] 🧹 Compacted {deleted} expired rows", flush=True)
+        except Exception as e:
+            print(f"❌ Time-series ingest error: {str(e)}", flush=True)
+        time.sleep(INGEST_INTERVAL)
+
+if __name__ == '__main__':
+    ingest_forever()
@@ -1,8 +1,19 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 import psycopg2
 import os
 import time
-import random
+import threading
+import atexit
+import json
+from concurrent.futures.process import BrokenProcessPool
+
+from db_pool import ConnectionPool
+from write_behind import WriteBehindQueue
+from cpu_pool import CpuTaskPool, PoolSaturated
+from health_probe import HealthProber
+from metrics import RequestMetrics
+from workloads import WORKLOADS, iter_random_chunks
+from schema import COUNT_QUERIES, create_schema, default_count_mode
 
 app = Flask(__name__)
 
@@ -15,9 +26,250 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'postgres')
 }
 
+# Connection pool configuration
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))                # seconds to wait for a free connection
+DB_POOL_VALIDATE_AFTER = float(os.getenv('DB_POOL_VALIDATE_AFTER', 30))  # re-check connections idle longer than this
+
+# Write mode for /db-test and /combined-test inserts:
+#   direct       - INSERT + COMMIT inside the request
+#   write_behind - enqueue in-process, flushed in batches by a background thread
+DB_WRITE_MODE = os.getenv('DB_WRITE_MODE', 'direct').lower()
+WRITE_BATCH_SIZE = int(os.getenv('WRITE_BATCH_SIZE', 500))
+WRITE_FLUSH_INTERVAL = float(os.getenv('WRITE_FLUSH_INTERVAL', 0.5))  # seconds
+WRITE_QUEUE_MAX = int(os.getenv('WRITE_QUEUE_MAX', 10000))
+
+# How /db-test reports total_records (overridable per request with ?count=...):
+#   exact       - SELECT COUNT(*) (full scan, slows down as the table grows)
+#   trigger     - sum of a few counter rows maintained by statement-level triggers
+#   approximate - planner estimate from pg_class.reltuples
+COUNT_MODE = default_count_mode(os.getenv('COUNT_MODE'))
+
+# Where CPU-bound handlers (/cpu-test, CPU part of /combined-test) run:
+#   inline  - in the request thread (blocks the GIL for everything else in the worker)
+#   process - in a separate process pool with a bounded queue
+CPU_EXECUTION_MODE = os.getenv('CPU_EXECUTION_MODE', 'inline').lower()
+CPU_POOL_WORKERS = int(os.getenv('CPU_POOL_WORKERS', 2))
+CPU_POOL_MAX_PENDING = int(os.getenv('CPU_POOL_MAX_PENDING', 8))  # queued tasks before answering 503
+CPU_TASK_TIMEOUT = float(os.getenv('CPU_TASK_TIMEOUT', 30))       # seconds
+
+# Default implementation of the synthetic workloads (overridable per request with ?mode=...):
+#   python     - pure-Python loops and lists
+#   vectorized - NumPy arrays
+WORKLOAD_MODE = os.getenv('WORKLOAD_MODE', 'python').lower()
+
+# /memory-test payload size (?size=N items) and streaming chunk size
+MEMORY_TEST_ITEMS = int(os.getenv('MEMORY_TEST_ITEMS', 1000000))
+MAX_PAYLOAD_ITEMS = int(os.getenv('MAX_PAYLOAD_ITEMS', 10000000))
+STREAM_CHUNK_ITEMS = int(os.getenv('STREAM_CHUNK_ITEMS', 10000))
+
+# /health answers from a background DB probe instead of connecting per call
+HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', 5))  # seconds between probes
+HEALTH_PROBE_TIMEOUT = int(os.getenv('HEALTH_PROBE_TIMEOUT', 3))      # connect timeout, seconds
+HEALTH_MAX_AGE = float(os.getenv('HEALTH_MAX_AGE', 3 * HEALTH_PROBE_INTERVAL))  # re-probe if the cache is older
+
+# One pool per process (gunicorn forks workers after import)
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Get (or lazily create) this process's connection pool"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(
+                    DB_CONFIG,
+                    minconn=DB_POOL_MIN,
+                    maxconn=DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    validate_after=DB_POOL_VALIDATE_AFTER
+                )
+                _pool_pid = os.getpid()
+                _pool.warm()
+    return _pool
+
 def get_db_connection():
-    """Create database connection"""
-    return psycopg2.connect(**DB_CONFIG)
+    """Borrow a database connection from the pool (close() returns it)"""
+    return get_pool().getconn()
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def ensure_schema():
+    """Create the test table once instead of on every request"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        # Plain connection: this may run in the gunicorn master before fork
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            create_schema(conn)
+        finally:
+            conn.close()
+        _schema_ready = True
+
+def count_test_logs(mode=None):
+    """Return (total_records, mode) using the requested counting strategy"""
+    mode = (mode or COUNT_MODE).lower()
+    if mode not in COUNT_QUERIES:
+        mode = COUNT_MODE
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(COUNT_QUERIES[mode])
+        total_records = cursor.fetchone()[0]
+        cursor.close()
+    finally:
+        # Always hand the connection back, even on errors
+        conn.close()
+    return total_records, mode
+
+# Write-behind queue, also one per process
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Get (or lazily start) this process's write-behind queue"""
+    global _writer, _writer_pid
+    if _writer is None or _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer_pid != os.getpid():
+                _writer = WriteBehindQueue(
+                    get_db_connection,
+                    batch_size=WRITE_BATCH_SIZE,
+                    flush_interval=WRITE_FLUSH_INTERVAL,
+                    max_queue=WRITE_QUEUE_MAX
+                ).start()
+                _writer_pid = os.getpid()
+    return _writer
+
+# CPU process pool, also one per web worker
+_cpu_pool = None
+_cpu_pool_pid = None
+_cpu_pool_lock = threading.Lock()
+
+def get_cpu_pool():
+    """Get (or lazily start) this process's CPU task pool"""
+    global _cpu_pool, _cpu_pool_pid
+    if _cpu_pool is None or _cpu_pool_pid != os.getpid():
+        with _cpu_pool_lock:
+            if _cpu_pool is None or _cpu_pool_pid != os.getpid():
+                _cpu_pool = CpuTaskPool(
+                    workers=CPU_POOL_WORKERS,
+                    max_pending=CPU_POOL_MAX_PENDING,
+                    timeout=CPU_TASK_TIMEOUT
+                )
+                _cpu_pool_pid = os.getpid()
+    return _cpu_pool
+
+def reset_cpu_pool(pool):
+    """Drop a broken CPU pool so the next get_cpu_pool() starts a new one"""
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is pool:
+            _cpu_pool = None
+    pool.shutdown()
+
+def run_cpu_task(func, *args):
+    """Run a CPU-bound workload in the configured execution mode
+
+    Returns (result, execution) where execution describes where it ran
+    and how long it waited / ran.
+    """
+    if CPU_EXECUTION_MODE == 'process':
+        pool = get_cpu_pool()
+        try:
+            result, timing = pool.run(func, *args)
+        except BrokenProcessPool:
+            # A child died mid-task (e.g. OOM-killed): every task on that pool fails from now on
+            reset_cpu_pool(pool)
+            raise
+    else:
+        start = time.perf_counter()
+        result = func(*args)
+        timing = {'queue_wait': 0.0, 'run_time': time.perf_counter() - start}
+    timing['mode'] = CPU_EXECUTION_MODE
+    return result, timing
+
+def get_workload(kind):
+    """Pick the workload implementation for this request"""
+    mode = request.args.get('mode', WORKLOAD_MODE).lower()
+    if mode not in WORKLOADS:
+        mode = 'python'
+    return WORKLOADS[mode][kind], mode
+
+def cpu_error_response(e):
+    """Map CPU pool errors to backpressure responses"""
+    if isinstance(e, PoolSaturated):
+        response = jsonify({'error': str(e), 'retry': True})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    if isinstance(e, BrokenProcessPool):
+        response = jsonify({'error': 'CPU worker process crashed, pool restarted', 'retry': True})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return jsonify({'error': f'CPU task timed out after {CPU_TASK_TIMEOUT}s'}), 504
+
+# Health prober, also one per web worker
+_prober = None
+_prober_pid = None
+_prober_lock = threading.Lock()
+
+def get_prober():
+    """Get (or lazily start) this process's background health prober"""
+    global _prober, _prober_pid
+    if _prober is None or _prober_pid != os.getpid():
+        with _prober_lock:
+            if _prober is None or _prober_pid != os.getpid():
+                _prober = HealthProber(
+                    DB_CONFIG,
+                    interval=HEALTH_PROBE_INTERVAL,
+                    timeout=HEALTH_PROBE_TIMEOUT
+                ).start()
+                _prober_pid = os.getpid()
+    return _prober
+
+@atexit.register
+def flush_writer():
+    """Write out queued rows when the worker shuts down"""
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.stop()
+
+def insert_test_log(message):
+    """Insert a test_logs row using the configured write mode
+
+    Returns the new row id, or None if the row was queued for a batch flush.
+    """
+    if DB_WRITE_MODE == 'write_behind' and get_writer().enqueue(message):
+        return None
+
+    # Direct mode, or the write-behind buffer is full (fall back to a synchronous insert)
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO test_logs (message) VALUES (%s) RETURNING id",
+            (message,)
+        )
+        record_id = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    return record_id
+
+# Create the table at startup (retried lazily if the DB is not reachable yet)
+try:
+    ensure_schema()
+except Exception as e:
+    print(f"Database not ready at startup, schema will be created on first use: {str(e)}")
 
 @app.route('/')
 def home():
@@ -30,13 +282,38 @@ def home():
 
 @app.route('/health')
 def health():
-    """Detailed health check with DB connection"""
-    try:
-        conn = get_db_connection()
-        conn.close()
-        return jsonify({'status': 'healthy', 'database': 'connected'})
-    except Exception as e:
-        return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
+    """Detailed health check with DB connection
+
+    Served from the background prober's cached result; ?deep=1 forces a
+    synchronous check. A missing or stale cache also triggers one.
+    """
+    prober = get_prober()
+    deep = request.args.get('deep', '0').lower() in ('1', 'true', 'yes')
+    if deep:
+        checked = 'deep'
+        result = prober.probe()
+    else:
+        checked = 'cached'
+        result = prober.cached(max_age=HEALTH_MAX_AGE)
+        if result is None:
+            # No result yet (worker just started) or the background prober fell behind
+            checked = 'probe' if prober.cached() is None else 'stale-refresh'
+            result = prober.probe()
+    
+    body = {
+        'status': 'healthy' if result['healthy'] else 'unhealthy',
+        'database': 'connected' if result['healthy'] else 'unreachable',
+        'checked': checked,
+        'age': result['age'],
+        'latency_ms': result['latency_ms'],
+        'last_error': result['last_error'],
+        'last_error_at': result['last_error_at'],
+        'consecutive_failures': result['consecutive_failures']
+    }
+    if not result['healthy']:
+        body['error'] = result['last_error']
+        return jsonify(body), 500
+    return jsonify(body)
 
 @app.route('/cpu-test')
 def cpu_test():
@@ -44,65 +321,89 @@ def cpu_test():
     start = time.time()
     
     # CPU-intensive calculation
-    result = 0
-    for i in range(1000000):
-        result += i ** 2
+    workload, mode = get_workload('cpu')
+    try:
+        result, execution = run_cpu_task(workload, 1000000)
+    except (PoolSaturated, BrokenProcessPool, TimeoutError) as e:
+        return cpu_error_response(e)
     
     duration = time.time() - start
     return jsonify({
         'test': 'cpu',
+        'mode': mode,
         'duration': duration,
-        'result': result
+        'result': result,
+        'execution': execution
     })
 
+def stream_memory_payload(items, mode, ndjson=False):
+    """Generate a /memory-test body chunk by chunk instead of building it in memory"""
+    header = {'test': 'memory', 'mode': mode, 'items_created': items, 'streamed': True}
+    
+    if ndjson:
+        # One metadata line, then one value per line
+        yield json.dumps(header) + '\n'
+        for chunk in iter_random_chunks(items, STREAM_CHUNK_ITEMS, mode):
+            yield '\n'.join(map(repr, chunk)) + '\n'
+        return
+    
+    # A single JSON document: the header fields followed by an "items" array
+    yield json.dumps(header)[:-1] + ', "items": ['
+    first = True
+    for chunk in iter_random_chunks(items, STREAM_CHUNK_ITEMS, mode):
+        body = json.dumps(chunk)[1:-1]
+        yield body if first else ', ' + body
+        first = False
+    yield ']}'
+
 @app.route('/memory-test')
 def memory_test():
     """Simulate memory-intensive task"""
-    # Create large list in memory
-    large_list = [random.random() for _ in range(1000000)]
+    try:
+        items = int(request.args.get('size', MEMORY_TEST_ITEMS))
+    except ValueError:
+        return jsonify({'error': 'size must be an integer'}), 400
+    if items < 0 or items > MAX_PAYLOAD_ITEMS:
+        return jsonify({'error': f'size must be between 0 and {MAX_PAYLOAD_ITEMS}'}), 400
+    
+    workload, mode = get_workload('memory')
+    
+    # Streaming: send every generated value without holding them all in memory
+    if request.args.get('stream', '0').lower() in ('1', 'true', 'yes'):
+        ndjson = request.args.get('format', 'json').lower() == 'ndjson'
+        return Response(
+            stream_memory_payload(items, mode, ndjson),
+            mimetype='application/x-ndjson' if ndjson else 'application/json'
+        )
+    
+    # Create large list (or array) in memory
+    items_created, sample = workload(items)
     
     return jsonify({
         'test': 'memory',
-        'items_created': len(large_list),
-        'sample': large_list[:5]
+        'mode': mode,
+        'items_created': items_created,
+        'sample': sample
     })
 
 @app.route('/db-test')
 def db_test():
     """Test database operations"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Create test table if not exists
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS test_logs (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                message TEXT
-            )
-        """)
+        ensure_schema()
         
         # Insert test record
-        cursor.execute(
-            "INSERT INTO test_logs (message) VALUES (%s) RETURNING id",
-            (f"Test at {time.time()}",)
-        )
-        
-        record_id = cursor.fetchone()[0]
+        record_id = insert_test_log(f"Test at {time.time()}")
         
         # Count total records
-        cursor.execute("SELECT COUNT(*) FROM test_logs")
-        total_records = cursor.fetchone()[0]
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        total_records, count_mode = count_test_logs(request.args.get('count'))
         
         return jsonify({
             'test': 'database',
             'new_record_id': record_id,
-            'total_records': total_records
+            'queued': record_id is None,
+            'total_records': total_records,
+            'count_mode': count_mode
         })
     
     except Exception as e:
@@ -112,30 +413,88 @@ def db_test():
 def combined_test():
     """Run all tests together - maximum load"""
     results = {}
+    cpu_workload, results['mode'] = get_workload('cpu')
+    memory_workload, _ = get_workload('memory')
     
     # CPU test
     cpu_start = time.time()
-    result = sum([i**2 for i in range(500000)])
+    try:
+        result, results['execution'] = run_cpu_task(cpu_workload, 500000)
+    except (PoolSaturated, BrokenProcessPool, TimeoutError) as e:
+        return cpu_error_response(e)
     results['cpu_time'] = time.time() - cpu_start
     
     # Memory test
-    large_data = [random.random() for _ in range(500000)]
-    results['memory_items'] = len(large_data)
+    results['memory_items'], _ = memory_workload(500000)
     
     # DB test
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO test_logs (message) VALUES (%s)", 
-                      ("Combined test",))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        results['database'] = 'success'
+        ensure_schema()
+        record_id = insert_test_log("Combined test")
+        results['database'] = 'success' if record_id is not None else 'queued'
     except Exception as e:
         results['database'] = f'error: {str(e)}'
     
     return jsonify(results)
 
+@app.route('/pool-stats')
+def pool_stats():
+    """Connection pool statistics for this worker process"""
+    stats = get_pool().stats()
+    stats['pid'] = os.getpid()
+    return jsonify(stats)
+
+@app.route('/write-stats')
+def write_stats():
+    """Write-behind queue statistics for this worker process"""
+    stats = get_writer().stats() if DB_WRITE_MODE == 'write_behind' else {}
+    stats['mode'] = DB_WRITE_MODE
+    stats['pid'] = os.getpid()
+    return jsonify(stats)
+
+@app.route('/cpu-stats')
+def cpu_stats():
+    """CPU process pool statistics for this worker process"""
+    stats = get_cpu_pool().stats() if CPU_EXECUTION_MODE == 'process' else {}
+    stats['mode'] = CPU_EXECUTION_MODE
+    stats['pid'] = os.getpid()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics():
+    """Request metrics for all workers (Prometheus text, or ?format=json with percentiles)"""
+    if request.args.get('format') == 'json':
+        return jsonify(request_metrics.summary())
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Request instrumentation. Created after all routes are registered so each
+# URL rule gets its own series; allocated in shared memory before gunicorn forks.
+request_metrics = RequestMetrics(rule.rule for rule in app.url_map.iter_rules())
+
+@app.before_request
+def start_timer():
+    """Mark the request start and count it as in flight"""
+    g.request_start = time.perf_counter()
+    request_metrics.request_started()
+
+@app.after_request
+def record_request(response):
+    """Feed the latency histogram and status counters once the response is sent
+
+    call_on_close runs after the last byte of the body, so streamed
+    responses are measured in full, not just until the handler returned.
+    """
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'other'
+        status = response.status_code
+        response.call_on_close(lambda: request_metrics.observe(route, status, time.perf_counter() - start))
+    return response
+
+@app.teardown_request
+def finish_request(exc):
+    """Runs even when a handler raised, so the in-flight gauge stays accurate"""
+    request_metrics.request_finished()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=False)
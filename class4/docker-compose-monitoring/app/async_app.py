@@ -0,0 +1,300 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+
+import asyncpg
+import psycopg2
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from schema import COUNT_QUERIES, create_schema, default_count_mode
+from workloads import WORKLOADS, run_timed
+
+# asyncio (ASGI) version of app.py, selected with APP_SERVER=async.
+# Same routes and responses; DB access goes through an asyncpg pool and
+# CPU work through a process pool, so the event loop never blocks.
+
+# Database configuration from environment variables
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', '5432'),
+    'database': os.getenv('DB_NAME', 'postgres'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'postgres')
+}
+
+# Same tuning knobs as the Flask app
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+COUNT_MODE = default_count_mode(os.getenv('COUNT_MODE'))
+CPU_POOL_WORKERS = int(os.getenv('CPU_POOL_WORKERS', 2))
+CPU_POOL_MAX_PENDING = int(os.getenv('CPU_POOL_MAX_PENDING', 8))
+CPU_TASK_TIMEOUT = float(os.getenv('CPU_TASK_TIMEOUT', 30))
+WORKLOAD_MODE = os.getenv('WORKLOAD_MODE', 'python').lower()
+MEMORY_TEST_ITEMS = int(os.getenv('MEMORY_TEST_ITEMS', 1000000))
+MAX_PAYLOAD_ITEMS = int(os.getenv('MAX_PAYLOAD_ITEMS', 10000000))
+
+
+class State:
+    """Per-process resources created at startup"""
+    db_pool = None
+    cpu_executor = None
+    cpu_active = 0
+
+
+def ensure_schema():
+    """Create tables with psycopg2 (runs once in a thread at startup)"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        create_schema(conn)
+    finally:
+        conn.close()
+
+@asynccontextmanager
+async def lifespan(app):
+    """Open the DB and CPU pools on startup, close them on shutdown"""
+    try:
+        await asyncio.to_thread(ensure_schema)
+    except Exception as e:
+        print(f"Schema setup failed: {str(e)}")
+
+    State.db_pool = await asyncpg.create_pool(
+        host=DB_CONFIG['host'],
+        port=int(DB_CONFIG['port']),
+        database=DB_CONFIG['database'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        min_size=DB_POOL_MIN,
+        max_size=DB_POOL_MAX
+    )
+    State.cpu_executor = new_cpu_executor()
+    try:
+        yield
+    finally:
+        await State.db_pool.close()
+        State.cpu_executor.shutdown(wait=False, cancel_futures=True)
+
+def new_cpu_executor():
+    return ProcessPoolExecutor(
+        max_workers=CPU_POOL_WORKERS,
+        mp_context=multiprocessing.get_context('spawn')
+    )
+
+def reset_cpu_executor(executor):
+    """Replace a broken CPU pool so the next task gets a working one"""
+    if State.cpu_executor is executor:
+        State.cpu_executor = new_cpu_executor()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def get_workload(request, kind):
+    """Pick the workload implementation for this request"""
+    mode = request.query_params.get('mode', WORKLOAD_MODE).lower()
+    if mode not in WORKLOADS:
+        mode = 'python'
+    return WORKLOADS[mode][kind], mode
+
+def cpu_error_response(e):
+    """Map CPU pool errors to backpressure responses"""
+    if isinstance(e, BrokenProcessPool):
+        return JSONResponse(
+            {'error': 'CPU worker process crashed, pool restarted', 'retry': True},
+            status_code=503,
+            headers={'Retry-After': '1'}
+        )
+    return JSONResponse({'error': f'CPU task timed out after {CPU_TASK_TIMEOUT}s'}, status_code=504)
+
+def busy_response():
+    return JSONResponse(
+        {'error': f'CPU pool saturated ({CPU_POOL_WORKERS} workers, {CPU_POOL_MAX_PENDING} pending)', 'retry': True},
+        status_code=503,
+        headers={'Retry-After': '1'}
+    )
+
+async def run_cpu_task(func, *args):
+    """Run a CPU-bound workload in the process pool without blocking the loop
+
+    Returns (result, execution), or None if the pool is saturated.
+    Raises asyncio.TimeoutError after CPU_TASK_TIMEOUT seconds, and
+    BrokenProcessPool when a pool child died (the pool is then replaced).
+    """
+    if State.cpu_active >= CPU_POOL_WORKERS + CPU_POOL_MAX_PENDING:
+        return None
+
+    loop = asyncio.get_running_loop()
+    executor = State.cpu_executor
+    State.cpu_active += 1
+    submitted_at = time.time()
+    submitted = False
+    try:
+        future = executor.submit(run_timed, func, *args)
+        submitted = True
+    except BrokenProcessPool:
+        reset_cpu_executor(executor)
+        raise
+    finally:
+        if not submitted:
+            State.cpu_active -= 1
+
+    def release(_):
+        # Slot is freed when the task really finishes, even if the caller timed out
+        State.cpu_active -= 1
+    future.add_done_callback(lambda f: loop.call_soon_threadsafe(release, f))
+
+    try:
+        result, started_at, run_time = await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)), CPU_TASK_TIMEOUT
+        )
+    except BrokenProcessPool:
+        # A child died mid-task (e.g. OOM-killed): every task on that pool fails from now on
+        reset_cpu_executor(executor)
+        raise
+    return result, {
+        'mode': 'process',
+        'queue_wait': max(0.0, started_at - submitted_at),
+        'run_time': run_time
+    }
+
+async def home(request):
+    """Home endpoint - simple health check"""
+    return JSONResponse({
+        'status': 'healthy',
+        'message': 'Monitoring System Flask App',
+        'server': 'async',
+        'timestamp': time.time()
+    })
+
+async def health(request):
+    """Detailed health check with DB connection"""
+    try:
+        async with State.db_pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            await conn.fetchval('SELECT 1')
+        return JSONResponse({'status': 'healthy', 'database': 'connected'})
+    except Exception as e:
+        return JSONResponse({'status': 'unhealthy', 'error': str(e)}, status_code=500)
+
+async def cpu_test(request):
+    """Simulate CPU-intensive task"""
+    start = time.time()
+    workload, mode = get_workload(request, 'cpu')
+    try:
+        task = await run_cpu_task(workload, 1000000)
+    except (asyncio.TimeoutError, BrokenProcessPool) as e:
+        return cpu_error_response(e)
+    if task is None:
+        return busy_response()
+
+    result, execution = task
+    return JSONResponse({
+        'test': 'cpu',
+        'mode': mode,
+        'duration': time.time() - start,
+        'result': result,
+        'execution': execution
+    })
+
+async def memory_test(request):
+    """Simulate memory-intensive task (in a thread, off the event loop)"""
+    try:
+        items = int(request.query_params.get('size', MEMORY_TEST_ITEMS))
+    except ValueError:
+        return JSONResponse({'error': 'size must be an integer'}, status_code=400)
+    if items < 0 or items > MAX_PAYLOAD_ITEMS:
+        return JSONResponse({'error': f'size must be between 0 and {MAX_PAYLOAD_ITEMS}'}, status_code=400)
+
+    workload, mode = get_workload(request, 'memory')
+    items_created, sample = await asyncio.to_thread(workload, items)
+    return JSONResponse({
+        'test': 'memory',
+        'mode': mode,
+        'items_created': items_created,
+        'sample': sample
+    })
+
+async def db_test(request):
+    """Test database operations"""
+    mode = request.query_params.get('count', COUNT_MODE).lower()
+    if mode not in COUNT_QUERIES:
+        mode = COUNT_MODE
+    try:
+        async with State.db_pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            record_id = await conn.fetchval(
+                "INSERT INTO test_logs (message) VALUES ($1) RETURNING id",
+                f"Test at {time.time()}"
+            )
+            total_records = await conn.fetchval(COUNT_QUERIES[mode])
+
+        return JSONResponse({
+            'test': 'database',
+            'new_record_id': record_id,
+            'queued': False,
+            'total_records': total_records,
+            'count_mode': mode
+        })
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+async def combined_test(request):
+    """Run all tests together - maximum load"""
+    results = {}
+    cpu_workload, results['mode'] = get_workload(request, 'cpu')
+    memory_workload, _ = get_workload(request, 'memory')
+
+    # CPU test
+    cpu_start = time.time()
+    try:
+        task = await run_cpu_task(cpu_workload, 500000)
+    except (asyncio.TimeoutError, BrokenProcessPool) as e:
+        return cpu_error_response(e)
+    if task is None:
+        return busy_response()
+    _, results['execution'] = task
+    results['cpu_time'] = time.time() - cpu_start
+
+    # Memory test
+    results['memory_items'], _ = await asyncio.to_thread(memory_workload, 500000)
+
+    # DB test
+    try:
+        async with State.db_pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+            await conn.execute("INSERT INTO test_logs (message) VALUES ($1)", "Combined test")
+        results['database'] = 'success'
+    except Exception as e:
+        results['database'] = f'error: {str(e)}'
+
+    return JSONResponse(results)
+
+async def pool_stats(request):
+    """Connection pool statistics for this worker process"""
+    pool = State.db_pool
+    return JSONResponse({
+        'min_size': pool.get_min_size(),
+        'max_size': pool.get_max_size(),
+        'size': pool.get_size(),
+        'idle': pool.get_idle_size(),
+        'in_use': pool.get_size() - pool.get_idle_size(),
+        'cpu_active': State.cpu_active,
+        'pid': os.getpid()
+    })
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/health', health),
+        Route('/cpu-test', cpu_test),
+        Route('/memory-test', memory_test),
+        Route('/db-test', db_test),
+        Route('/combined-test', combined_test),
+        Route('/pool-stats', pool_stats)
+    ],
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=8000)
@@ -0,0 +1,51 @@
+"""Compare the pure-Python and NumPy versions of the test workloads.
+
+Usage:
+    python benchmark_workloads.py [repeats]
+
+    docker-compose exec webapp python benchmark_workloads.py
+"""
+import sys
+import time
+import tracemalloc
+
+from workloads import WORKLOADS
+
+# Same sizes the endpoints use
+CASES = [
+    ('/cpu-test', 'cpu', 1000000),
+    ('/memory-test', 'memory', 1000000),
+    ('/combined-test (cpu)', 'cpu', 500000),
+    ('/combined-test (memory)', 'memory', 500000)
+]
+
+def measure(func, size, repeats):
+    """Return (best wall time, peak traced memory) over several runs"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(size)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print("=" * 78)
+    print(f"Workload benchmark (best of {repeats} runs, peak memory from tracemalloc)")
+    print("=" * 78)
+    print(f"{'Case':<26}{'python':>12}{'vectorized':>12}{'speedup':>9}{'py mem':>10}{'np mem':>9}")
+
+    for name, kind, size in CASES:
+        py_time, py_mem = measure(WORKLOADS['python'][kind], size, repeats)
+        np_time, np_mem = measure(WORKLOADS['vectorized'][kind], size, repeats)
+        print(f"{name:<26}{py_time * 1000:>10.1f}ms{np_time * 1000:>10.1f}ms"
+              f"{py_time / np_time:>8.1f}x{py_mem / 2**20:>8.1f}MB{np_mem / 2**20:>7.1f}MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from workloads import run_timed
+
+
+class PoolSaturated(Exception):
+    """Raised when every worker is busy and the pending queue is full"""
+
+
+class CpuTaskPool:
+    """Runs CPU-bound workloads in separate processes, off the request thread.
+
+    At most `workers + max_pending` tasks are admitted at once; anything
+    beyond that is rejected immediately with PoolSaturated so callers can
+    answer with a 503 instead of piling up requests.
+    """
+
+    def __init__(self, workers=2, max_pending=8, timeout=30.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._executor = self._new_executor()
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+
+        # Counters exposed through stats()
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._failed = 0
+        self._queue_wait_total = 0.0
+        self._run_time_total = 0.0
+
+    def _new_executor(self):
+        # spawn: the web worker has threads (pool, flusher), forking it is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+
+    def _submit(self, func, *args):
+        try:
+            return self._executor.submit(run_timed, func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the whole pool once
+            with self._lock:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+            return self._executor.submit(run_timed, func, *args)
+
+    def _release(self, future):
+        self._slots.release()
+        with self._lock:
+            self._active -= 1
+
+    def run(self, func, *args):
+        """Run func(*args) in a worker process and wait for the result
+
+        Returns (result, timing) where timing has queue_wait and run_time
+        in seconds. Raises PoolSaturated or concurrent.futures.TimeoutError.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PoolSaturated(f'CPU pool saturated ({self.workers} workers, {self.max_pending} pending)')
+
+        submitted_at = time.time()
+        with self._lock:
+            self._active += 1
+            self._submitted += 1
+        try:
+            future = self._submit(func, *args)
+        except Exception:
+            self._release(None)
+            raise
+        # Slot is freed when the task really finishes, even if the caller timed out
+        future.add_done_callback(self._release)
+
+        try:
+            result, started_at, run_time = future.result(timeout=self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            raise
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+
+        queue_wait = max(0.0, started_at - submitted_at)
+        with self._lock:
+            self._completed += 1
+            self._queue_wait_total += queue_wait
+            self._run_time_total += run_time
+        return result, {'queue_wait': queue_wait, 'run_time': run_time}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            completed = self._completed
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'active': self._active,
+                'submitted': self._submitted,
+                'completed': completed,
+                'rejected': self._rejected,
+                'timed_out': self._timed_out,
+                'failed': self._failed,
+                'avg_queue_wait_ms': round(self._queue_wait_total / completed * 1000, 3) if completed else 0.0,
+                'avg_run_time_ms': round(self._run_time_total / completed * 1000, 3) if completed else 0.0
+            }
@@ -0,0 +1,254 @@
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class PooledConnection:
+    """Thin proxy around a psycopg2 connection.
+
+    Everything is delegated to the real connection except close(), which
+    hands the connection back to the pool instead of tearing it down.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise psycopg2.InterfaceError('connection already returned to pool')
+        return getattr(self._conn, name)
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+    def close(self):
+        """Return the connection to the pool"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same as psycopg2's `with conn:` (commit on success, roll back on error),
+        # then hand the connection back
+        if self._conn is not None and not self._conn.closed:
+            try:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+            finally:
+                self.close()
+        else:
+            self.close()
+
+    def __del__(self):
+        # Safety net for code paths that forget to close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe PostgreSQL connection pool.
+
+    - At most `maxconn` connections are open at any time; callers wait up to
+      `timeout` seconds for one to be released before PoolTimeout is raised.
+    - Idle connections are handed out LIFO (warmest first) and re-validated
+      with `SELECT 1` if they sat unused for more than `validate_after` seconds.
+    """
+
+    def __init__(self, db_config, minconn=1, maxconn=10, timeout=5.0, validate_after=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError('invalid pool size: min=%s max=%s' % (minconn, maxconn))
+
+        self.db_config = db_config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.validate_after = validate_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, returned_at)
+        self._size = 0        # open connections, idle + in use
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False  # set by closeall(); released connections are closed, not kept
+
+        # Counters exposed through stats()
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._created = 0
+        self._discarded = 0
+        self._validation_failures = 0
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.db_config)
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._discarded += 1
+
+    def _is_usable(self, conn, returned_at):
+        """Check an idle connection before handing it out"""
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.validate_after:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            with self._cond:
+                self._validation_failures += 1
+            return False
+
+    def warm(self):
+        """Open connections up to `minconn` (best effort)"""
+        while True:
+            with self._cond:
+                if self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def getconn(self):
+        """Check out a connection, waiting up to `timeout` seconds"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        conn = None
+        with self._cond:
+            if self._closed:
+                raise psycopg2.InterfaceError('connection pool is closed')
+            waited = False
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f'no database connection available after {self.timeout}s '
+                        f'(pool max={self.maxconn})'
+                    )
+                waited = True
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+        # Connect / validate outside the lock so other threads are not blocked
+        if conn is not None and not self._is_usable(conn, returned_at):
+            self._discard(conn)
+            conn = None
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        wait = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            if waited:
+                self._waits += 1
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Put a connection back; broken or dirty connections are dropped"""
+        if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+
+        with self._cond:
+            closed = self._closed
+        usable = (not closed and not conn.closed and
+                  conn.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE)
+        if not usable:
+            self._discard(conn)
+
+        with self._cond:
+            self._in_use -= 1
+            if usable:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+            self._cond.notify()
+
+    def closeall(self):
+        """Close idle connections (in-use ones are closed when released)"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Snapshot of pool occupancy and wait times"""
+        with self._cond:
+            return {
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'checkouts_waited': self._waits,
+                'timeouts': self._timeouts,
+                'avg_wait_ms': round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'max_wait_ms': round(self._wait_max * 1000, 3),
+                'connections_created': self._created,
+                'connections_discarded': self._discarded,
+                'validation_failures': self._validation_failures
+            }
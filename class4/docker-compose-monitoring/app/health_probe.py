@@ -0,0 +1,99 @@
+import threading
+import time
+
+import psycopg2
+
+
+class HealthProber:
+    """Checks database liveness in the background and caches the result.
+
+    A single persistent connection runs `SELECT 1` every `interval`
+    seconds, so /health can answer from memory no matter how often it is
+    polled. The prober reconnects after any failure.
+    """
+
+    def __init__(self, db_config, interval=5.0, timeout=3):
+        self.db_config = db_config
+        self.interval = interval
+        self.timeout = timeout
+
+        self._conn = None
+        self._lock = threading.Lock()       # guards the cached result
+        self._probe_lock = threading.Lock()  # one probe at a time on the shared connection
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='health-prober', daemon=True)
+
+        self._result = None
+        self._last_error = None
+        self._last_error_at = None
+        self._consecutive_failures = 0
+        self._probes = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self.interval)
+
+    def probe(self):
+        """Run one synchronous check and update the cached result"""
+        with self._probe_lock:
+            start = time.perf_counter()
+            try:
+                if self._conn is None or self._conn.closed:
+                    self._conn = psycopg2.connect(connect_timeout=self.timeout, **self.db_config)
+                    self._conn.autocommit = True
+                cursor = self._conn.cursor()
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+                cursor.close()
+                healthy, error = True, None
+            except Exception as e:
+                healthy, error = False, str(e).strip()
+                if self._conn is not None:
+                    try:
+                        self._conn.close()
+                    except Exception:
+                        pass
+                    self._conn = None
+            latency = time.perf_counter() - start
+
+        with self._lock:
+            now = time.time()
+            self._probes += 1
+            if healthy:
+                self._consecutive_failures = 0
+            else:
+                self._consecutive_failures += 1
+                self._last_error = error
+                self._last_error_at = now
+            self._result = {
+                'healthy': healthy,
+                'checked_at': now,
+                'latency_ms': round(latency * 1000, 3)
+            }
+            return self._snapshot()
+
+    def _snapshot(self):
+        result = dict(self._result)
+        result['age'] = round(time.time() - result['checked_at'], 3)
+        result['last_error'] = self._last_error
+        result['last_error_at'] = self._last_error_at
+        result['consecutive_failures'] = self._consecutive_failures
+        result['probes'] = self._probes
+        return result
+
+    def cached(self, max_age=None):
+        """Latest result, or None if there is none (or it is older than max_age)"""
+        with self._lock:
+            if self._result is None:
+                return None
+            if max_age is not None and time.time() - self._result['checked_at'] > max_age:
+                return None
+            return self._snapshot()
@@ -0,0 +1,197 @@
+import fcntl
+import os
+import tempfile
+import threading
+from multiprocessing.sharedctypes import RawArray
+
+# Histogram bucket upper bounds in seconds (a final +Inf bucket is implied)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Status codes tracked individually; anything else is counted as "other"
+STATUS_CODES = (200, 201, 204, 301, 302, 304, 400, 401, 403, 404, 405, 429, 500, 502, 503, 504)
+
+OTHER_ROUTE = 'other'
+
+# Upper bound on worker processes measured at the same time (one shard each)
+METRICS_SHARDS = int(os.getenv('METRICS_SHARDS', 32))
+
+
+class RequestMetrics:
+    """Per-route request latency histograms, status counters and in-flight gauge.
+
+    Counters live in shared memory allocated at import time, so when the
+    app is preloaded by gunicorn every forked worker can serve the totals
+    on /metrics. The memory is split into one shard per worker and each
+    worker only writes its own, so no lock is shared between processes:
+    a worker killed mid-update (OOM kill, max-requests recycling) cannot
+    block the others. Reads sum the shards.
+
+    A worker claims a shard on its first request by taking a lockf() lock
+    on one byte of an anonymous file. The kernel drops the lock when the
+    process dies, so its replacement takes the shard over and keeps adding
+    to the same totals.
+
+    Routes are fixed when the registry is created (the URL rule, not the
+    raw path), which keeps memory constant and label cardinality bounded.
+    """
+
+    def __init__(self, routes, shards=METRICS_SHARDS):
+        self.routes = sorted(set(routes)) + [OTHER_ROUTE]
+        self._route_index = {route: i for i, route in enumerate(self.routes)}
+        self._status_index = {code: i for i, code in enumerate(STATUS_CODES)}
+
+        n = len(self.routes)
+        self.shards = shards
+        self._nb = len(BUCKETS) + 1
+        self._ns = len(STATUS_CODES) + 1
+        self._buckets = RawArray('Q', shards * n * self._nb)  # per-bucket (non-cumulative) counts
+        self._sums = RawArray('d', shards * n)                # total seconds per route
+        self._status = RawArray('Q', shards * n * self._ns)
+        self._in_flight = RawArray('q', shards)
+
+        self._claims = tempfile.TemporaryFile()  # byte i locked by the owner of shard i
+        self._shard = None
+        self._shard_pid = None
+        self._lock = threading.Lock()            # threads of this process only
+
+    def _route(self, route):
+        return self._route_index.get(route, self._route_index[OTHER_ROUTE])
+
+    def _claim(self):
+        for shard in range(self.shards):
+            try:
+                fcntl.lockf(self._claims, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, shard)
+            except OSError:
+                continue
+            # A previous owner died; its requests are no longer in flight
+            self._in_flight[shard] = 0
+            return shard
+        print(f"⚠️  All {self.shards} metrics shards are taken, worker {os.getpid()} is not measured "
+              f"(raise METRICS_SHARDS)", flush=True)
+        return None
+
+    def _own_shard(self):
+        """This process's shard, claimed on first use; None when every shard is taken"""
+        if self._shard_pid != os.getpid():
+            with self._lock:
+                if self._shard_pid != os.getpid():
+                    self._shard = self._claim()
+                    self._shard_pid = os.getpid()
+        return self._shard
+
+    def request_started(self):
+        shard = self._own_shard()
+        if shard is not None:
+            with self._lock:
+                self._in_flight[shard] += 1
+
+    def request_finished(self):
+        shard = self._own_shard()
+        if shard is not None:
+            with self._lock:
+                self._in_flight[shard] -= 1
+
+    def observe(self, route, status, duration):
+        """Record one completed request"""
+        r = self._route(route)
+        b = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                b = i
+                break
+        s = self._status_index.get(status, self._ns - 1)
+        shard = self._own_shard()
+        if shard is None:
+            return
+        r += shard * len(self.routes)
+        with self._lock:
+            self._buckets[r * self._nb + b] += 1
+            self._sums[r] += duration
+            self._status[r * self._ns + s] += 1
+
+    def _read(self):
+        """All counters summed over the shards
+
+        Read without locking: a shard being written at that moment may be
+        one request behind in some of its counters.
+        """
+        n = len(self.routes)
+
+        def total(array, width):
+            size = n * width
+            sums = array[0:size]
+            for shard in range(1, self.shards):
+                sums = [a + b for a, b in zip(sums, array[shard * size:(shard + 1) * size])]
+            return sums
+
+        return total(self._buckets, self._nb), total(self._sums, 1), total(self._status, self._ns), sum(self._in_flight)
+
+    @staticmethod
+    def _quantile(counts, q):
+        """Estimate a quantile from bucket counts (linear within a bucket)"""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                lower = BUCKETS[i - 1] if i else 0.0
+                return lower + (BUCKETS[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return BUCKETS[-1]
+
+    def summary(self):
+        """Per-route counts, average and p50/p95/p99 latency in milliseconds"""
+        buckets, sums, status, in_flight = self._read()
+        routes = {}
+        for r, route in enumerate(self.routes):
+            counts = buckets[r * self._nb:(r + 1) * self._nb]
+            total = sum(counts)
+            if not total:
+                continue
+            codes = {}
+            for s, code in enumerate(list(STATUS_CODES) + ['other']):
+                if status[r * self._ns + s]:
+                    codes[str(code)] = status[r * self._ns + s]
+            routes[route] = {
+                'count': total,
+                'avg_ms': round(sums[r] / total * 1000, 3),
+                'p50_ms': round(self._quantile(counts, 0.50) * 1000, 3),
+                'p95_ms': round(self._quantile(counts, 0.95) * 1000, 3),
+                'p99_ms': round(self._quantile(counts, 0.99) * 1000, 3),
+                'status': codes
+            }
+        return {'in_flight': in_flight, 'routes': routes}
+
+    def render(self, prefix='webapp'):
+        """Prometheus text exposition format"""
+        buckets, sums, status, in_flight = self._read()
+        lines = [
+            f'# HELP {prefix}_request_duration_seconds Request latency by route.',
+            f'# TYPE {prefix}_request_duration_seconds histogram'
+        ]
+        for r, route in enumerate(self.routes):
+            counts = buckets[r * self._nb:(r + 1) * self._nb]
+            cumulative = 0
+            for i, count in enumerate(counts):
+                cumulative += count
+                le = f'{BUCKETS[i]:g}' if i < len(BUCKETS) else '+Inf'
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{route="{route}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{{route="{route}"}} {sums[r]:.6f}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{route="{route}"}} {cumulative}')
+
+        lines.append(f'# HELP {prefix}_requests_total Completed requests by route and status code.')
+        lines.append(f'# TYPE {prefix}_requests_total counter')
+        for r, route in enumerate(self.routes):
+            for s, code in enumerate(list(STATUS_CODES) + ['other']):
+                value = status[r * self._ns + s]
+                if value:
+                    lines.append(f'{prefix}_requests_total{{route="{route}",status="{code}"}} {value}')
+
+        lines.append(f'# HELP {prefix}_requests_in_flight Requests currently being handled.')
+        lines.append(f'# TYPE {prefix}_requests_in_flight gauge')
+        lines.append(f'{prefix}_requests_in_flight {in_flight}')
+        return '\n'.join(lines) + '\n'
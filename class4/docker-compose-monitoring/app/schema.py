@@ -0,0 +1,97 @@
+# Schema setup shared by the Flask app (app.py) and the asyncio app
+# (async_app.py). Uses psycopg2 so it can run before either server starts.
+
+COUNT_SLOTS = 16  # counter rows, spreads concurrent updates over several row locks
+
+COUNT_QUERIES = {
+    'exact': "SELECT COUNT(*) FROM test_logs",
+    'trigger': "SELECT COALESCE(SUM(row_count), 0) FROM test_logs_stats",
+    'approximate': "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = 'test_logs'::regclass"
+}
+
+def default_count_mode(mode):
+    """COUNT_MODE from the environment, or 'trigger' when it is not a known mode"""
+    mode = (mode or 'trigger').lower()
+    if mode not in COUNT_QUERIES:
+        print(f"Unknown COUNT_MODE '{mode}', using 'trigger' (choices: {', '.join(COUNT_QUERIES)})")
+        return 'trigger'
+    return mode
+
+def create_schema(conn):
+    """Create test_logs and its row counter (idempotent)"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS test_logs (
+            id SERIAL PRIMARY KEY,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            message TEXT
+        )
+    """)
+    conn.commit()
+    create_counter(cursor)
+    conn.commit()
+    cursor.close()
+
+def create_counter(cursor):
+    """Set up the trigger-maintained row counter for test_logs
+
+    Statement-level triggers with transition tables add one UPDATE per
+    INSERT/DELETE statement (not per row), so batched inserts stay cheap.
+    """
+    # Serialize setup across workers and block writers while seeding the count
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('test_logs_stats'))")
+    # Replaced every time so existing databases get fixes to the function
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION test_logs_count() RETURNS trigger AS $$
+        DECLARE
+            delta BIGINT;
+            -- Picked once: random() in the WHERE clause would be evaluated per row
+            v_slot INT := floor(random() * {COUNT_SLOTS})::int;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                SELECT COUNT(*) INTO delta FROM new_rows;
+            ELSIF TG_OP = 'DELETE' THEN
+                SELECT -COUNT(*) INTO delta FROM old_rows;
+            ELSE
+                UPDATE test_logs_stats SET row_count = 0;
+                RETURN NULL;
+            END IF;
+            IF delta <> 0 THEN
+                UPDATE test_logs_stats SET row_count = row_count + delta
+                WHERE slot = v_slot;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cursor.execute("SELECT to_regclass('test_logs_stats')")
+    if cursor.fetchone()[0] is not None:
+        return
+
+    cursor.execute("LOCK TABLE test_logs IN SHARE ROW EXCLUSIVE MODE")
+    cursor.execute("""
+        CREATE TABLE test_logs_stats (
+            slot INTEGER PRIMARY KEY,
+            row_count BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute(
+        "INSERT INTO test_logs_stats (slot, row_count) "
+        "SELECT s, CASE WHEN s = 0 THEN (SELECT COUNT(*) FROM test_logs) ELSE 0 END "
+        "FROM generate_series(0, %s) AS s",
+        (COUNT_SLOTS - 1,)
+    )
+    cursor.execute("""
+        CREATE TRIGGER test_logs_count_insert AFTER INSERT ON test_logs
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION test_logs_count()
+    """)
+    cursor.execute("""
+        CREATE TRIGGER test_logs_count_delete AFTER DELETE ON test_logs
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION test_logs_count()
+    """)
+    cursor.execute("""
+        CREATE TRIGGER test_logs_count_truncate AFTER TRUNCATE ON test_logs
+        FOR EACH STATEMENT EXECUTE FUNCTION test_logs_count()
+    """)
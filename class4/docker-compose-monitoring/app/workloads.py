@@ -0,0 +1,72 @@
+import random
+import time
+
+import numpy as np
+
+# Synthetic workloads used by the test endpoints. They live in their own
+# module (no Flask / psycopg2 imports) so pool worker processes can import
+# them cheaply and pickle them by reference.
+#
+# Each workload has a pure-Python version and a NumPy ("vectorized")
+# version returning the same values.
+
+# Vectorized CPU work runs in fixed-size chunks so memory stays small and
+# each chunk's int64 dot product cannot overflow (limit ~11.8M iterations)
+VECTOR_CHUNK = 65536
+MAX_VECTORIZED_ITERATIONS = 10000000
+
+def cpu_workload(iterations=1000000):
+    """Sum of squares in a pure-Python loop (holds the GIL while running)"""
+    result = 0
+    for i in range(iterations):
+        result += i ** 2
+    return result
+
+def cpu_workload_vectorized(iterations=1000000):
+    """Sum of squares as chunked int64 dot products"""
+    if iterations > MAX_VECTORIZED_ITERATIONS:
+        raise ValueError(f'vectorized cpu workload supports at most {MAX_VECTORIZED_ITERATIONS} iterations')
+    result = 0
+    for start in range(0, iterations, VECTOR_CHUNK):
+        values = np.arange(start, min(start + VECTOR_CHUNK, iterations), dtype=np.int64)
+        result += int(np.dot(values, values))
+    return result
+
+def memory_workload(items=1000000):
+    """Python list of random floats (~32 bytes per boxed item)
+
+    Returns (items_created, sample of the first five values).
+    """
+    large_list = [random.random() for _ in range(items)]
+    return len(large_list), large_list[:5]
+
+def memory_workload_vectorized(items=1000000):
+    """NumPy float64 array of random values (8 bytes per item)"""
+    values = np.random.default_rng().random(items)
+    return len(values), values[:5].tolist()
+
+def iter_random_chunks(items, chunk_size=10000, mode='python'):
+    """Yield `items` random floats as lists of at most `chunk_size` values
+
+    Only one chunk is alive at a time, so memory stays flat however large
+    `items` gets.
+    """
+    rng = np.random.default_rng() if mode == 'vectorized' else None
+    for start in range(0, items, chunk_size):
+        count = min(chunk_size, items - start)
+        if rng is not None:
+            yield rng.random(count).tolist()
+        else:
+            yield [random.random() for _ in range(count)]
+
+WORKLOADS = {
+    'python': {'cpu': cpu_workload, 'memory': memory_workload},
+    'vectorized': {'cpu': cpu_workload_vectorized, 'memory': memory_workload_vectorized}
+}
+
+def run_timed(func, *args):
+    """Run func(*args) and report when it started and how long it took"""
+    started_at = time.time()
+    start = time.perf_counter()
+    result = func(*args)
+    return result, started_at, time.perf_counter() - start
@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+
+class WriteBehindQueue:
+    """In-process buffer that flushes test_logs inserts in batches.
+
+    Requests only enqueue (message, timestamp) tuples; a single background
+    thread drains the queue and writes up to `batch_size` rows per
+    multi-row INSERT, flushing at least every `flush_interval` seconds.
+    """
+
+    INSERT_SQL = "INSERT INTO test_logs (message, timestamp) VALUES %s"
+
+    def __init__(self, get_connection, batch_size=500, flush_interval=0.5, max_queue=10000):
+        self.get_connection = get_connection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+
+        # Counters exposed through stats()
+        self._enqueued = 0
+        self._rejected = 0
+        self._flushed_rows = 0
+        self._failed_rows = 0
+        self._batches = 0
+        self._last_batch_size = 0
+        self._last_flush_ms = 0.0
+        self._last_error = None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def enqueue(self, message):
+        """Queue a row for insertion; returns False if the buffer is full"""
+        try:
+            self._queue.put_nowait((message, datetime.now()))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            return False
+        with self._lock:
+            self._enqueued += 1
+        return True
+
+    def _next_batch(self):
+        """Block for the first row, then collect more until size or time runs out"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        start = time.monotonic()
+        try:
+            conn = self.get_connection()
+            try:
+                cursor = conn.cursor()
+                execute_values(cursor, self.INSERT_SQL, batch, page_size=self.batch_size)
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            with self._lock:
+                self._failed_rows += len(batch)
+                self._last_error = str(e)
+            print(f"❌ Write-behind flush of {len(batch)} rows failed: {str(e)}")
+            return
+
+        with self._lock:
+            self._flushed_rows += len(batch)
+            self._batches += 1
+            self._last_batch_size = len(batch)
+            self._last_flush_ms = (time.monotonic() - start) * 1000
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    def stop(self, timeout=5.0):
+        """Stop the flusher and write out whatever is still queued"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        batch = self._drain()
+        while batch:
+            self._flush(batch)
+            batch = self._drain()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'max_queue': self._queue.maxsize,
+                'batch_size': self.batch_size,
+                'flush_interval': self.flush_interval,
+                'enqueued': self._enqueued,
+                'rejected': self._rejected,
+                'flushed_rows': self._flushed_rows,
+                'failed_rows': self._failed_rows,
+                'batches': self._batches,
+                'avg_batch_size': round(self._flushed_rows / self._batches, 1) if self._batches else 0.0,
+                'last_batch_size': self._last_batch_size,
+                'last_flush_ms': round(self._last_flush_ms, 3),
+                'last_error': self._last_error
+            }
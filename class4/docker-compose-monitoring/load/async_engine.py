@@ -0,0 +1,171 @@
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+# asyncio load engine for stress.py (LOAD_ENGINE=async).
+#
+# One aiohttp session with a keep-alive connection pool drives all traffic
+# from a single thread, which is far cheaper per request than a thread
+# per in-flight request with `requests`.
+
+
+class AsyncLoadEngine:
+    """Generates load with up to `concurrency` requests in flight.
+
+    With a `rate` the engine is open-loop: requests start on a fixed or
+    Poisson schedule and latency is measured from the scheduled time.
+    `rate` may also be a function of seconds since the start returning
+    the current rate, or None to end the run (a load profile).
+    Without one, `concurrency` workers send back-to-back requests as fast
+    as the target answers.
+    """
+
+    def __init__(self, target_url, choose_scenario, on_result, concurrency=100, rate=None,
+                 arrival='constant', max_backlog=5000, timeout=5, pool_size=None,
+                 force_new_connections=False):
+        self.target_url = target_url
+        self.choose_scenario = choose_scenario
+        self.concurrency = concurrency
+        self.rate_at = rate if callable(rate) else (lambda elapsed: rate)
+        self.rate = rate
+        self.arrival = arrival
+        self.max_backlog = max_backlog
+        self.timeout = timeout
+        self.on_result = on_result
+        self.pool_size = pool_size or concurrency
+        self.force_new_connections = force_new_connections
+
+    async def _request(self, session, step, context):
+        """Send one scenario step and report it like stress.make_request() does"""
+        method, path, body = step.request(context)
+        if isinstance(body, (dict, list)):
+            kwargs = {'json': body}
+        else:
+            kwargs = {'data': body}
+        trace = {'new_connection': False}
+        start = time.perf_counter()
+        try:
+            async with session.request(method, f"{self.target_url}{path}", headers=step.headers,
+                                       trace_request_ctx=trace, **kwargs) as response:
+                payload = await response.read()
+                result = {
+                    'endpoint': step.name,
+                    'status': response.status,
+                    'time': time.perf_counter() - start,
+                    'success': True,
+                    'new_connection': trace['new_connection']
+                }
+                if step.save:
+                    try:
+                        result['json'] = json.loads(payload)
+                    except ValueError:
+                        pass
+        except Exception as e:
+            result = {
+                'endpoint': step.name,
+                'status': 0,
+                'time': 0,
+                'success': False,
+                'error': str(e) or type(e).__name__
+            }
+        return result
+
+    async def _scenario(self, session, scenario, intended=None):
+        """Run a scenario's steps in order (see stress.run_scenario)"""
+        context = scenario.new_context()
+        for i, step in enumerate(scenario.steps):
+            if i:
+                await asyncio.sleep(scenario.think(step))
+            try:
+                result = await self._request(session, step, context)
+            except (KeyError, IndexError, ValueError) as e:
+                self.on_result('Async', step.name, step.failed(f"cannot build request: missing {e}"))
+                return
+            if i == 0 and intended is not None:
+                result['service_time'] = result['time']
+                result['time'] = time.perf_counter() - intended
+            self.on_result('Async', step.name, result)
+            if not step.after(result, context):
+                return
+
+    async def _closed_worker(self, session):
+        while True:
+            await self._scenario(session, self.choose_scenario())
+
+    async def _open_loop(self, session):
+        slots = asyncio.Semaphore(self.concurrency)
+        backlog = 0
+        pending = set()  # scheduled requests, also keeps the tasks referenced
+
+        async def scheduled(scenario, intended):
+            nonlocal backlog
+            async with slots:
+                backlog -= 1
+                await self._scenario(session, scenario, intended)
+
+        loop = asyncio.get_running_loop()
+        start = intended = loop.time()
+        while True:
+            rate = self.rate_at(intended - start)
+            if rate is None:
+                break
+            if rate <= 0:
+                intended += 0.1  # idle, check the rate again shortly
+            elif self.arrival == 'poisson':
+                intended += random.expovariate(rate)
+            else:
+                intended += 1.0 / rate
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if rate <= 0:
+                continue
+
+            scenario = self.choose_scenario()
+            if backlog >= self.max_backlog:
+                endpoint = scenario.steps[0].name
+                self.on_result('Async', endpoint, {
+                    'endpoint': endpoint,
+                    'success': False,
+                    'dropped': True,
+                    'error': f'client backlog full ({self.max_backlog})'
+                })
+                continue
+            backlog += 1
+            # Convert the loop clock to perf_counter for latency measurement
+            task = loop.create_task(scheduled(scenario, time.perf_counter() - (loop.time() - intended)))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        # Profile finished: let requests already scheduled complete
+        if pending:
+            await asyncio.wait(pending)
+
+    @staticmethod
+    async def _on_connection_created(session, context, params):
+        context.trace_request_ctx['new_connection'] = True
+
+    async def run(self):
+        if self.force_new_connections:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300, force_close=True)
+        else:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        # Flag requests that had to open a connection (for the reuse rate)
+        tracing = aiohttp.TraceConfig()
+        tracing.on_connection_create_end.append(self._on_connection_created)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         trace_configs=[tracing]) as session:
+            if callable(self.rate) or self.rate:
+                tasks = [asyncio.create_task(self._open_loop(session))]
+            else:
+                tasks = [asyncio.create_task(self._closed_worker(session))
+                         for _ in range(self.concurrency)]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
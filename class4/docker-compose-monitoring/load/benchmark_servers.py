@@ -0,0 +1,89 @@
+"""Compare requests/sec of the sync (Flask) and async (ASGI) webapp.
+
+Runs each STRESS_CONFIG level against both servers for BENCH_DURATION
+seconds, with one closed-loop thread per configured thread (no delay
+between requests) hitting the DB-backed routes.
+
+Usage:
+    docker-compose --profile bench up -d webapp-async
+    docker-compose run --rm load python benchmark_servers.py
+"""
+import os
+import threading
+import time
+
+import requests
+
+from stress import STRESS_CONFIG
+
+SERVERS = {
+    'sync': os.getenv('SYNC_URL', 'http://webapp:8000'),
+    'async': os.getenv('ASYNC_URL', 'http://webapp-async:8000')
+}
+BENCH_DURATION = float(os.getenv('BENCH_DURATION', 20))  # seconds per level and server
+BENCH_ENDPOINTS = ['/', '/health', '/db-test', '/combined-test']
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_level(base_url, threads, duration):
+    """Hammer base_url with `threads` closed-loop clients for `duration` seconds"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        session = requests.Session()
+        local, failed, i = [], 0, offset
+        while time.monotonic() < deadline:
+            endpoint = BENCH_ENDPOINTS[i % len(BENCH_ENDPOINTS)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                response = session.get(f"{base_url}{endpoint}", timeout=10)
+                if response.status_code >= 400:
+                    failed += 1
+            except Exception:
+                failed += 1
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    workers = [threading.Thread(target=client, args=(n,)) for n in range(threads)]
+    start = time.monotonic()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'errors': errors[0]
+    }
+
+def main():
+    print("=" * 72)
+    print(f"Server benchmark: {BENCH_DURATION:.0f}s per level, endpoints {', '.join(BENCH_ENDPOINTS)}")
+    for name, url in SERVERS.items():
+        print(f"  {name:<6} {url}")
+    print("=" * 72)
+    print(f"{'Level':<9}{'Threads':>8}{'Server':>8}{'Req/s':>10}{'p50':>10}{'p99':>10}{'Errors':>8}")
+
+    for level, config in STRESS_CONFIG.items():
+        for name, url in SERVERS.items():
+            r = run_level(url, config['threads'], BENCH_DURATION)
+            print(f"{level:<9}{config['threads']:>8}{name:>8}{r['rps']:>10.1f}"
+                  f"{r['p50'] * 1000:>8.1f}ms{r['p99'] * 1000:>8.1f}ms{r['errors']:>8}")
+
+if __name__ == '__main__':
+    main()
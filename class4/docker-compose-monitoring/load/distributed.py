@@ -0,0 +1,284 @@
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import stress
+from profiles import LoadProfile
+from stats import format_summary, merge_snapshots
+
+# Distributed load generation: one coordinator, several workers.
+#
+# Workers register with the coordinator (LOAD_ROLE=worker). Once
+# EXPECTED_WORKERS have joined, the coordinator fixes a start time
+# START_DELAY seconds ahead and every worker gets the same plan (engine,
+# rate, profile, traffic mix) plus its share of the request rate.
+# Workers push cumulative histogram snapshots every WORKER_REPORT_INTERVAL
+# seconds and a final one when they stop. The coordinator merges them into
+# a single report.
+#
+#   POST /register  {"worker": id}                      -> assignment (409 once the run is planned)
+#   GET  /plan?worker=id                                 -> assignment, start_at is null until all joined
+#   POST /report    {"worker": id, "final": bool, "snapshot": {...}}
+#   GET  /status                                         -> workers and the merged summary so far
+
+COORDINATOR_URL = os.getenv('COORDINATOR_URL', 'http://load-coordinator:8089')
+COORDINATOR_PORT = int(os.getenv('COORDINATOR_PORT', 8089))
+EXPECTED_WORKERS = int(os.getenv('EXPECTED_WORKERS', 2))
+START_DELAY = float(os.getenv('START_DELAY', 10))                   # seconds from the last join to the start
+WORKER_REPORT_INTERVAL = float(os.getenv('WORKER_REPORT_INTERVAL', 5))
+FINAL_REPORT_GRACE = float(os.getenv('FINAL_REPORT_GRACE', 15))     # coordinator: wait for final reports on stop
+WORKER_ID = os.getenv('WORKER_ID') or socket.gethostname()
+
+
+class Coordinator:
+    """Worker registry, shared plan and latest results of a distributed run"""
+
+    def __init__(self, plan, expected):
+        self.plan = plan
+        self.expected = expected
+        self.start_at = None
+        self.done = threading.Event()   # set when every worker sent its final report
+        self._lock = threading.Lock()
+        self._workers = {}              # id -> {'index', 'snapshot', 'final'}
+
+    def _assignment(self, worker_id):
+        return {
+            'worker': worker_id,
+            'index': self._workers[worker_id]['index'],
+            'workers': self.expected,
+            'share': 1.0 / self.expected,
+            'start_at': self.start_at,
+            'plan': self.plan
+        }
+
+    def register(self, worker_id):
+        """Assignment for a worker, or None if the run is already planned without it"""
+        with self._lock:
+            if worker_id not in self._workers:
+                if self.start_at is not None:
+                    return None
+                self._workers[worker_id] = {'index': len(self._workers), 'snapshot': None, 'final': False}
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] 👷 Worker {worker_id} joined "
+                      f"({len(self._workers)}/{self.expected})", flush=True)
+                if len(self._workers) == self.expected:
+                    self.start_at = time.time() + START_DELAY
+                    print(f"🚦 All workers joined, starting at "
+                          f"{datetime.fromtimestamp(self.start_at).strftime('%H:%M:%S')}", flush=True)
+            return self._assignment(worker_id)
+
+    def assignment(self, worker_id):
+        with self._lock:
+            if worker_id not in self._workers:
+                return None
+            return self._assignment(worker_id)
+
+    def report(self, worker_id, snapshot, final):
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if worker is None:
+                return False
+            worker['snapshot'] = snapshot
+            worker['final'] = worker['final'] or final
+            if final:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] 🏁 Worker {worker_id} finished", flush=True)
+            if self._workers and all(w['final'] for w in self._workers.values()):
+                self.done.set()
+            return True
+
+    def missing(self):
+        """Workers that have not sent their final report"""
+        with self._lock:
+            return sorted(worker_id for worker_id, w in self._workers.items() if not w['final'])
+
+    def merged(self):
+        """(merged report, per-worker request counts), or (None, {}) before any results"""
+        with self._lock:
+            snapshots = {worker_id: w['snapshot'] for worker_id, w in self._workers.items() if w['snapshot']}
+        if not snapshots:
+            return None, {}
+        counts = {worker_id: sum(e['succeeded'] + e['failed'] for e in snapshot['endpoints'].values())
+                  for worker_id, snapshot in snapshots.items()}
+        report = merge_snapshots(snapshots.values())
+        report['started_at'] = min(snapshot['started_at'] for snapshot in snapshots.values())
+        return report, counts
+
+    def status(self):
+        report, counts = self.merged()
+        with self._lock:
+            workers = {worker_id: {'index': w['index'], 'final': w['final'], 'requests': counts.get(worker_id, 0)}
+                       for worker_id, w in self._workers.items()}
+        return {'expected': self.expected, 'start_at': self.start_at, 'workers': workers, 'report': report}
+
+
+def run_length(plan):
+    """Seconds a worker's run lasts, or None when it runs until stopped"""
+    lengths = []
+    if plan['run_duration']:
+        lengths.append(plan['run_duration'])
+    if plan['profile']:
+        lengths.append(LoadProfile(plan['profile']).duration)
+    return min(lengths) if lengths else None
+
+
+def make_handler(coordinator):
+    class CoordinatorHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload=None):
+            body = json.dumps(payload).encode() if payload is not None else b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/plan':
+                worker_id = parse_qs(url.query).get('worker', [''])[0]
+                assignment = coordinator.assignment(worker_id)
+                if assignment is None:
+                    self._send(404, {'error': f'unknown worker {worker_id}'})
+                else:
+                    self._send(200, assignment)
+            elif url.path == '/status':
+                self._send(200, coordinator.status())
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            try:
+                data = self._body()
+            except ValueError:
+                self._send(400, {'error': 'invalid JSON'})
+                return
+            if self.path == '/register':
+                assignment = coordinator.register(data['worker'])
+                if assignment is None:
+                    self._send(409, {'error': 'run already started'})
+                else:
+                    self._send(200, assignment)
+            elif self.path == '/report':
+                if coordinator.report(data['worker'], data['snapshot'], data.get('final', False)):
+                    self._send(204)
+                else:
+                    self._send(404, {'error': f"unknown worker {data['worker']}"})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def log_message(self, format, *args):
+            pass  # requests are logged as worker events instead
+
+    return CoordinatorHandler
+
+
+def run_coordinator(plan):
+    """Serve the plan to workers and merge their results into one report"""
+    coordinator = Coordinator(plan, EXPECTED_WORKERS)
+    server = ThreadingHTTPServer(('0.0.0.0', COORDINATOR_PORT), make_handler(coordinator))
+    threading.Thread(target=server.serve_forever, name='coordinator', daemon=True).start()
+
+    print("=" * 60)
+    print(f"🧭 Load Coordinator listening on port {COORDINATOR_PORT}")
+    print(f"Target: {stress.TARGET_URL}")
+    print(f"Stress Level: {plan['stress_level'].upper()} | Engine: {plan['engine']}")
+    print(f"Waiting for {EXPECTED_WORKERS} workers...")
+    print("=" * 60, flush=True)
+
+    signal.signal(signal.SIGTERM, stress.stop)
+    length = run_length(plan)
+    try:
+        while not coordinator.done.wait(min(stress.SUMMARY_INTERVAL or 10, FINAL_REPORT_GRACE)):
+            report, counts = coordinator.merged()
+            if report and report['requests']:
+                label = f"[{datetime.now().strftime('%H:%M:%S')}] All workers so far"
+                print(format_summary(report, label), flush=True)
+                print('   Per worker: ' + ', '.join(f"{w} {n}" for w, n in sorted(counts.items())), flush=True)
+            # A lost final report must not keep the coordinator waiting forever
+            if (length is not None and coordinator.start_at is not None and
+                    time.time() > coordinator.start_at + length + FINAL_REPORT_GRACE):
+                break
+    except KeyboardInterrupt:
+        print(f"\n🛑 Coordinator stopping, waiting up to {FINAL_REPORT_GRACE:g}s for final reports")
+        coordinator.done.wait(FINAL_REPORT_GRACE)
+
+    missing = coordinator.missing()
+    if missing:
+        print(f"⚠️  No final report from {', '.join(missing)}; their last snapshots are used", flush=True)
+    report, counts = coordinator.merged()
+    server.shutdown()
+    if report is None:
+        print("No results received from workers")
+        return
+    started_at = report.pop('started_at')
+    report.update({
+        'target': stress.TARGET_URL,
+        'stress_level': plan['stress_level'],
+        'engine': plan['engine'],
+        'profile': plan['profile_name'],
+        'workers': counts,
+        'missing_workers': missing,
+        'started_at': datetime.fromtimestamp(started_at).isoformat(timespec='seconds'),
+        'finished_at': datetime.now().isoformat(timespec='seconds')
+    })
+    print(format_summary(report, f"Run summary ({len(counts)} workers)"))
+    stress.write_reports(report, started_at)
+
+
+def _post(path, payload, attempts=3):
+    for attempt in range(attempts):
+        try:
+            response = requests.post(f"{COORDINATOR_URL}{path}", json=payload, timeout=5)
+            return response
+        except requests.RequestException as e:
+            error = e
+            time.sleep(1 + attempt)
+    print(f"⚠️  Coordinator unreachable: {error}")
+    return None
+
+def run_worker():
+    """Join the coordinator, run this worker's share of the plan, report back"""
+    print(f"👷 Worker {WORKER_ID} joining {COORDINATOR_URL}...", flush=True)
+    while True:
+        try:
+            response = requests.post(f"{COORDINATOR_URL}/register", json={'worker': WORKER_ID}, timeout=5)
+            if response.status_code == 409:
+                print("❌ The coordinator's run has already started without this worker")
+                return
+            response.raise_for_status()
+            assignment = response.json()
+            break
+        except requests.RequestException:
+            time.sleep(2)  # coordinator not up yet
+
+    while assignment['start_at'] is None:
+        time.sleep(1)
+        try:
+            response = requests.get(f"{COORDINATOR_URL}/plan", params={'worker': WORKER_ID}, timeout=5)
+            response.raise_for_status()
+            assignment = response.json()
+        except requests.RequestException:
+            time.sleep(2)  # coordinator briefly unreachable, ask again
+    print(f"Worker {assignment['index'] + 1}/{assignment['workers']}, "
+          f"{assignment['share'] * 100:.0f}% of the request rate", flush=True)
+
+    finished = threading.Event()
+
+    def push_snapshots():
+        while not finished.wait(WORKER_REPORT_INTERVAL):
+            _post('/report', {'worker': WORKER_ID, 'final': False, 'snapshot': stress.STATS.snapshot()}, attempts=1)
+
+    threading.Thread(target=push_snapshots, name='snapshot-pusher', daemon=True).start()
+    stress.run(assignment['plan'], share=assignment['share'], start_at=assignment['start_at'], save=False)
+    finished.set()
+    _post('/report', {'worker': WORKER_ID, 'final': True, 'snapshot': stress.STATS.snapshot()})
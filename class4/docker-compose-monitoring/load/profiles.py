@@ -0,0 +1,132 @@
+import json
+import os
+
+# Load profiles: a run made of timed stages, each with a target request rate.
+#
+# A profile is a JSON list of stages (or {"stages": [...]}):
+#
+#   {"type": "constant", "duration": 60, "rps": 50}
+#   {"type": "ramp", "duration": 300, "from": 10, "to": 400}          linear
+#   {"type": "steps", "from": 50, "to": 500, "step": 50, "step_duration": 30}
+#   {"type": "spike", "rps": 50, "peak": 1000, "duration": 60, "spike_duration": 10}
+#   {"type": "soak", "duration": 3600, "rps": 50}                     long constant
+#
+# "steps" and "spike" expand to constant stages, so every step of a
+# staircase gets its own section in the report. Any stage may set "name".
+
+
+def _expand(stage):
+    """Turn one stage definition into a list of constant/ramp stages"""
+    kind = stage.get('type', 'constant')
+    name = stage.get('name')
+
+    if kind in ('constant', 'soak'):
+        rps = float(stage['rps'])
+        return [{'type': 'constant', 'duration': float(stage['duration']), 'from': rps, 'to': rps,
+                 'name': name or f"{kind} {rps:g}/s"}]
+
+    if kind == 'ramp':
+        start, end = float(stage['from']), float(stage['to'])
+        return [{'type': 'ramp', 'duration': float(stage['duration']), 'from': start, 'to': end,
+                 'name': name or f"ramp {start:g}->{end:g}/s"}]
+
+    if kind == 'steps':
+        start, end, step = float(stage['from']), float(stage['to']), float(stage['step'])
+        if step <= 0:
+            raise ValueError('steps: step must be positive')
+        stages = []
+        rps = start
+        while rps <= end + 1e-9:
+            stages.extend(_expand({'type': 'constant', 'duration': stage['step_duration'], 'rps': rps,
+                                   'name': f"{name or 'step'} {rps:g}/s"}))
+            rps += step
+        return stages
+
+    if kind == 'spike':
+        base, peak = float(stage['rps']), float(stage['peak'])
+        duration, spike = float(stage['duration']), float(stage['spike_duration'])
+        if not 0 <= spike <= duration:
+            raise ValueError(f"spike: spike_duration ({spike:g}s) must be between 0 and duration ({duration:g}s)")
+        before = (duration - spike) / 2
+        prefix = f"{name} " if name else ''
+        return [
+            {'type': 'constant', 'duration': before, 'from': base, 'to': base, 'name': f"{prefix}before spike {base:g}/s"},
+            {'type': 'constant', 'duration': spike, 'from': peak, 'to': peak, 'name': f"{prefix}spike {peak:g}/s"},
+            {'type': 'constant', 'duration': duration - spike - before, 'from': base, 'to': base,
+             'name': f"{prefix}after spike {base:g}/s"}
+        ]
+
+    raise ValueError(f"unknown stage type '{kind}'")
+
+
+class LoadProfile:
+    """Target request rate as a function of time since the start of the run"""
+
+    def __init__(self, stages, scale=1.0):
+        self.spec = list(stages)  # as given, before expansion (sent to distributed workers)
+        self.scale = scale        # multiplies every rate, e.g. 1/N for one of N workers
+        self.stages = []
+        for stage in stages:
+            self.stages.extend(_expand(stage))
+        if not self.stages:
+            raise ValueError('load profile has no stages')
+        for stage in self.stages:
+            if stage['duration'] < 0:
+                raise ValueError(f"stage '{stage['name']}': duration must not be negative ({stage['duration']:g}s)")
+            if stage['from'] < 0 or stage['to'] < 0:
+                raise ValueError(f"stage '{stage['name']}': request rate must not be negative")
+
+        # Stage start offsets, for rate_at()
+        self._starts = []
+        offset = 0.0
+        for stage in self.stages:
+            self._starts.append(offset)
+            offset += stage['duration']
+        self.duration = offset
+
+    def stage_at(self, elapsed):
+        """Index of the stage running at `elapsed` seconds, or None once the profile is over"""
+        if elapsed >= self.duration:
+            return None
+        index = 0
+        while index + 1 < len(self.stages) and self._starts[index + 1] <= elapsed:
+            index += 1
+        return index
+
+    def rate_at(self, elapsed):
+        """(requests/sec, stage index) at `elapsed` seconds, or None once the profile is over"""
+        index = self.stage_at(elapsed)
+        if index is None:
+            return None
+        stage = self.stages[index]
+        progress = (elapsed - self._starts[index]) / stage['duration'] if stage['duration'] else 1.0
+        return (stage['from'] + (stage['to'] - stage['from']) * progress) * self.scale, index
+
+    def describe(self):
+        return [f"{stage['name']} for {stage['duration']:g}s" for stage in self.stages]
+
+
+def preset(name, rps):
+    """Built-in profiles, scaled from a stress level's requests_per_second"""
+    presets = {
+        'ramp': [{'type': 'ramp', 'duration': 300, 'from': 1, 'to': rps * 4}],
+        'steps': [{'type': 'steps', 'from': rps, 'to': rps * 5, 'step': rps, 'step_duration': 60}],
+        'spike': [{'type': 'spike', 'rps': rps, 'peak': rps * 10, 'duration': 135, 'spike_duration': 15}],
+        'soak': [{'type': 'soak', 'duration': 3600, 'rps': rps}]
+    }
+    return presets.get(name)
+
+def load_profile(spec, rps):
+    """Build a LoadProfile from a preset name, inline JSON or a JSON file path"""
+    stages = preset(spec, rps)
+    if stages is None:
+        if spec.lstrip().startswith(('[', '{')):
+            stages = json.loads(spec)
+        elif os.path.exists(spec):
+            with open(spec) as f:
+                stages = json.load(f)
+        else:
+            raise ValueError(f"LOAD_PROFILE '{spec}' is not a preset, JSON or an existing file")
+    if isinstance(stages, dict):
+        stages = stages['stages']
+    return LoadProfile(stages)
@@ -0,0 +1,156 @@
+import bisect
+import itertools
+import json
+import os
+import random
+
+# Traffic mix for the load generator: weighted scenarios of one or more steps.
+#
+# A scenario file (SCENARIOS, path or inline JSON) looks like:
+#
+#   {
+#     "endpoints": {"/": 50, "/health": 30, "/cpu-test": 5},      single-GET shorthand
+#     "scenarios": [
+#       {"name": "write-then-check", "weight": 10, "think_time": [0.2, 1.0],
+#        "steps": [{"path": "/db-test"}, {"path": "/health"}]},
+#       {"name": "blog", "weight": 5,
+#        "steps": [{"method": "POST", "path": "/posts", "save": {"post_id": "id"},
+#                   "json": {"title": "Load test {n}", "content": "...", "author": "load"}},
+#                  {"path": "/posts/{post_id}", "name": "/posts/<id>"},
+#                  {"method": "DELETE", "path": "/posts/{post_id}", "name": "DELETE /posts/<id>"}]}
+#     ]
+#   }
+#
+# Paths and string values in bodies are format strings: {n} is a sequence
+# number, {rand} a random integer, and "save" copies fields of a step's
+# JSON response (dotted paths allowed) for the following steps.
+# think_time (seconds, or [min, max]) is the pause between steps; a step
+# may set its own. A scenario stops at the first step that fails.
+
+_sequence = itertools.count(1)
+
+
+def _think(value):
+    if isinstance(value, (list, tuple)):
+        return random.uniform(*value)
+    return float(value or 0)
+
+def _render(value, context):
+    """Fill {placeholders} in strings, recursively through dicts and lists"""
+    if isinstance(value, str):
+        return value.format_map(context)
+    if isinstance(value, dict):
+        return {key: _render(item, context) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_render(item, context) for item in value]
+    return value
+
+
+class Step:
+    """One HTTP request in a scenario"""
+
+    def __init__(self, spec):
+        self.method = spec.get('method', 'GET').upper()
+        self.path = spec['path']
+        self.json = spec.get('json')
+        self.data = spec.get('data')
+        self.headers = spec.get('headers')
+        self.save = spec.get('save', {})
+        self.think_time = spec.get('think_time')
+        # Stats label: the path template, not the rendered path, to keep the number of series bounded
+        self.name = spec.get('name') or (self.path if self.method == 'GET' else f"{self.method} {self.path}")
+
+    def request(self, context):
+        """(method, path, body) with placeholders filled in; body is a dict (JSON), a string or None"""
+        body = _render(self.json, context) if self.json is not None else _render(self.data, context)
+        return self.method, _render(self.path, context), body
+
+    def failed(self, error):
+        """Result for a request that could not be built"""
+        return {'endpoint': self.name, 'status': 0, 'time': 0, 'success': False, 'error': error}
+
+    def after(self, result, context):
+        """Copy the fields listed in `save` from the JSON response into the context
+
+        Returns False when the scenario should stop here (the step failed).
+        """
+        response_json = result.pop('json', None)
+        if not result['success'] or result['status'] >= 400:
+            return False
+        try:
+            for key, field in self.save.items():
+                value = response_json
+                for part in field.split('.'):
+                    value = value[part]
+                context[key] = value
+        except (KeyError, IndexError, TypeError):
+            return False
+        return True
+
+
+class Scenario:
+    """A weighted sequence of steps with think time between them"""
+
+    def __init__(self, spec):
+        self.name = spec.get('name', spec['steps'][0]['path'])
+        self.weight = float(spec.get('weight', 1))
+        self.think_time = spec.get('think_time', 0)
+        self.steps = [Step(step) for step in spec['steps']]
+
+    def think(self, step):
+        """Seconds to pause before `step`"""
+        return _think(step.think_time if step.think_time is not None else self.think_time)
+
+    @staticmethod
+    def new_context():
+        return {'n': next(_sequence), 'rand': random.randint(0, 1_000_000_000)}
+
+
+class ScenarioMix:
+    """Picks scenarios at random according to their weights"""
+
+    def __init__(self, scenarios):
+        self.scenarios = [scenario for scenario in scenarios if scenario.weight > 0]
+        if not self.scenarios:
+            raise ValueError('traffic mix has no scenarios with a positive weight')
+        self._cumulative = list(itertools.accumulate(scenario.weight for scenario in self.scenarios))
+
+    def choose(self):
+        index = bisect.bisect(self._cumulative, random.random() * self._cumulative[-1])
+        return self.scenarios[min(index, len(self.scenarios) - 1)]
+
+    def describe(self):
+        total = self._cumulative[-1]
+        return [f"{scenario.weight / total * 100:5.1f}%  {scenario.name} "
+                f"({' -> '.join(step.name for step in scenario.steps)})" for scenario in self.scenarios]
+
+    @classmethod
+    def uniform(cls, endpoints):
+        """Every endpoint equally likely, one GET each (the default mix)"""
+        return cls([Scenario({'steps': [{'path': path}]}) for path in endpoints])
+
+    @classmethod
+    def from_config(cls, config):
+        specs = [{'name': path, 'weight': weight, 'steps': [{'path': path}]}
+                 for path, weight in config.get('endpoints', {}).items()]
+        specs.extend(config.get('scenarios', []))
+        return cls([Scenario(spec) for spec in specs])
+
+
+def read_mix_config(spec):
+    """Mix config from inline JSON or a JSON file, or None when spec is empty"""
+    if not spec:
+        return None
+    if spec.lstrip().startswith('{'):
+        return json.loads(spec)
+    if os.path.exists(spec):
+        with open(spec) as f:
+            return json.load(f)
+    raise ValueError(f"SCENARIOS '{spec}' is neither JSON nor an existing file")
+
+def load_mix(spec, endpoints):
+    """ScenarioMix from inline JSON or a JSON file, or the uniform mix when spec is empty"""
+    config = read_mix_config(spec)
+    if config is None:
+        return ScenarioMix.uniform(endpoints)
+    return ScenarioMix.from_config(config)
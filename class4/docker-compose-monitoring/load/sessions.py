@@ -0,0 +1,65 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Keep-alive sessions for the threaded load engines.
+#
+# urllib3 reconnects a dropped keep-alive connection on the same connection
+# object, so its pool counters do not show real TCP handshakes. These
+# classes count every connect() in a per-thread counter instead.
+
+_local = threading.local()
+
+
+def connections_opened():
+    """TCP connections opened by the current thread so far"""
+    return getattr(_local, 'connects', 0)
+
+def _count_connect():
+    _local.connects = connections_opened() + 1
+
+
+class CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        super().connect()
+        _count_connect()
+
+class CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        super().connect()
+        _count_connect()
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CountingHTTPConnection
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CountingHTTPSConnection
+
+
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count the connections they open"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool
+        }
+
+
+def new_session(pool_size=1, force_new_connections=False):
+    """Session keeping up to pool_size connections per host open between requests
+
+    With force_new_connections every request asks the server to close its
+    connection, so the next one has to connect again.
+    """
+    session = requests.Session()
+    adapter = CountingAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if force_new_connections:
+        session.headers['Connection'] = 'close'
+    return session
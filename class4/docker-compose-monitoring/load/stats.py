@@ -0,0 +1,364 @@
+import csv
+import json
+import threading
+import time
+
+# Latency statistics for the load generator, in constant memory.
+#
+# Every response time lands in a fixed-size log-linear histogram (the
+# HdrHistogram layout): exact 1µs buckets below 64µs, then 32 buckets per
+# power of two, so any recorded value is off by at most ~3% and the whole
+# 1µs..60s range fits in ~750 counters no matter how long the run is.
+
+SUB_BUCKET_BITS = 6                        # 2**6 linear buckets at the bottom
+HALF_BUCKETS = 1 << (SUB_BUCKET_BITS - 1)  # buckets per power of two above that
+MAX_LATENCY_US = 60_000_000                # larger values are clamped to 60s
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+def _bucket_index(value):
+    shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+    return shift * HALF_BUCKETS + (value >> shift)
+
+def _bucket_bounds(index):
+    """[lower, upper) of a bucket in microseconds"""
+    if index < 2 * HALF_BUCKETS:
+        return index, index + 1
+    shift = index // HALF_BUCKETS - 1
+    mantissa = index - shift * HALF_BUCKETS
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LatencyHistogram:
+    """Fixed-size latency histogram with ~3% relative precision"""
+
+    SIZE = _bucket_index(MAX_LATENCY_US) + 1
+
+    def __init__(self):
+        self.counts = [0] * self.SIZE
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1_000_000), 0), MAX_LATENCY_US)
+        self.counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other):
+        """Add another histogram's samples to this one"""
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p):
+        """Value in seconds below which p percent of samples fall"""
+        if not self.count:
+            return 0.0
+        rank = max(1, round(p / 100 * self.count))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                lower, upper = _bucket_bounds(i)
+                # Midpoint of the bucket, kept inside the observed range
+                value = (lower + upper) / 2 / 1_000_000
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        """count, mean, min, max and percentiles in milliseconds"""
+        if not self.count:
+            return {'count': 0}
+        result = {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3),
+            'min_ms': round(self.min * 1000, 3),
+            'max_ms': round(self.max * 1000, 3)
+        }
+        for p in PERCENTILES:
+            result[f'p{p:g}_ms'] = round(self.percentile(p) * 1000, 3)
+        return result
+
+    def to_dict(self):
+        """Sparse, JSON-serialisable form (see from_dict)"""
+        return {
+            'counts': {str(i): c for i, c in enumerate(self.counts) if c},
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        for i, c in data['counts'].items():
+            histogram.counts[int(i)] = c
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+
+class EndpointStats:
+    """Counters and latency histogram for one endpoint"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.succeeded = 0   # got a response (any status)
+        self.failed = 0      # no response: timeout, connection error...
+        self.dropped = 0     # never sent: client backlog full
+        self.status = {}     # response count per HTTP status code
+        self.new_connections = 0
+
+    def record(self, result):
+        if result.get('dropped'):
+            self.dropped += 1
+        elif result['success']:
+            self.succeeded += 1
+            self.latency.record(result['time'])
+            self.status[result['status']] = self.status.get(result['status'], 0) + 1
+            if result.get('new_connection'):
+                self.new_connections += 1
+        else:
+            self.failed += 1
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.succeeded += other.succeeded
+        self.failed += other.failed
+        self.dropped += other.dropped
+        self.new_connections += other.new_connections
+        for code, count in other.status.items():
+            self.status[code] = self.status.get(code, 0) + count
+
+    @property
+    def requests(self):
+        return self.succeeded + self.failed
+
+    @property
+    def http_errors(self):
+        return sum(count for code, count in self.status.items() if code >= 400)
+
+    def summary(self, elapsed):
+        errors = self.failed + self.http_errors
+        return {
+            'requests': self.requests,
+            'rps': round(self.requests / elapsed, 2) if elapsed > 0 else 0.0,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'http_errors': self.http_errors,
+            'dropped': self.dropped,
+            'error_rate': round(errors / self.requests, 4) if self.requests else 0.0,
+            'new_connections': self.new_connections,
+            # Share of responses served on an already open (keep-alive) connection
+            'connection_reuse': round(1 - self.new_connections / self.succeeded, 4) if self.succeeded else 0.0,
+            'status': {str(code): count for code, count in sorted(self.status.items())},
+            'latency': self.latency.summary()
+        }
+
+    def to_dict(self):
+        return {
+            'latency': self.latency.to_dict(),
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'new_connections': self.new_connections,
+            'status': {str(code): count for code, count in self.status.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.latency = LatencyHistogram.from_dict(data['latency'])
+        stats.succeeded = data['succeeded']
+        stats.failed = data['failed']
+        stats.dropped = data['dropped']
+        stats.new_connections = data.get('new_connections', 0)
+        stats.status = {int(code): count for code, count in data['status'].items()}
+        return stats
+
+
+class StatsCollector:
+    """Thread-safe per-endpoint statistics for a whole run.
+
+    Keeps cumulative totals for the final report, a second set that is
+    reset by every interval() call for the periodic summary and, when a
+    load profile runs, one set per stage (by completion time).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard everything recorded so far and restart the clock"""
+        with self._lock:
+            self.started_at = time.time()
+            self._endpoints = {}
+            self._interval = {}
+            self._interval_started = self._run_started = time.monotonic()
+            self._stages = []
+
+    def start_stage(self, name):
+        """Attribute results from now on to a new stage of the run"""
+        with self._lock:
+            now = time.monotonic()
+            if self._stages:
+                self._stages[-1]['ended'] = now
+            self._stages.append({'name': name, 'started': now, 'ended': None, 'endpoints': {}})
+
+    @property
+    def stage(self):
+        return self._stages[-1]['name'] if self._stages else None
+
+    def record(self, endpoint, result):
+        with self._lock:
+            tables = [self._endpoints, self._interval]
+            if self._stages:
+                tables.append(self._stages[-1]['endpoints'])
+            for table in tables:
+                stats = table.get(endpoint)
+                if stats is None:
+                    stats = table[endpoint] = EndpointStats()
+                stats.record(result)
+
+    @staticmethod
+    def _report(endpoints, elapsed):
+        overall = EndpointStats()
+        for stats in endpoints.values():
+            overall.merge(stats)
+        report = overall.summary(elapsed)
+        report['duration'] = round(elapsed, 3)
+        report['endpoints'] = {name: stats.summary(elapsed) for name, stats in sorted(endpoints.items())}
+        return report
+
+    def interval(self):
+        """Report for the period since the previous call, then start a new one"""
+        with self._lock:
+            endpoints, self._interval = self._interval, {}
+            now = time.monotonic()
+            elapsed, self._interval_started = now - self._interval_started, now
+        return self._report(endpoints, elapsed)
+
+    @staticmethod
+    def _copy(endpoints):
+        copy = {}
+        for name, stats in endpoints.items():
+            copy[name] = EndpointStats()
+            copy[name].merge(stats)
+        return copy
+
+    def report(self):
+        """Report for the whole run, with a section per stage if there were any"""
+        with self._lock:
+            # Copy under the lock so the report is consistent
+            now = time.monotonic()
+            endpoints = self._copy(self._endpoints)
+            elapsed = now - self._run_started
+            stages = [(stage['name'], self._copy(stage['endpoints']), (stage['ended'] or now) - stage['started'])
+                      for stage in self._stages]
+
+        report = self._report(endpoints, elapsed)
+        if stages:
+            report['stages'] = [{'name': name, **self._report(stage_endpoints, duration)}
+                                for name, stage_endpoints, duration in stages]
+        return report
+
+    def snapshot(self):
+        """JSON-serialisable copy of all counters so far (see merge_snapshots)"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'started_at': self.started_at,
+                'elapsed': now - self._run_started,
+                'endpoints': {name: stats.to_dict() for name, stats in self._endpoints.items()},
+                'stages': [{
+                    'name': stage['name'],
+                    'duration': (stage['ended'] or now) - stage['started'],
+                    'endpoints': {name: stats.to_dict() for name, stats in stage['endpoints'].items()}
+                } for stage in self._stages]
+            }
+
+
+def _merge_endpoints(tables):
+    merged = {}
+    for table in tables:
+        for name, data in table.items():
+            merged.setdefault(name, EndpointStats()).merge(EndpointStats.from_dict(data))
+    return merged
+
+def merge_snapshots(snapshots):
+    """One report from several collectors' snapshots, e.g. from distributed workers
+
+    Throughput is the combined rate over the longest run; stages are
+    matched by position, so every snapshot should come from the same profile.
+    """
+    snapshots = list(snapshots)
+    elapsed = max((snapshot['elapsed'] for snapshot in snapshots), default=0.0)
+    report = StatsCollector._report(_merge_endpoints(s['endpoints'] for s in snapshots), elapsed)
+
+    stage_count = max((len(snapshot['stages']) for snapshot in snapshots), default=0)
+    if stage_count:
+        report['stages'] = []
+        for i in range(stage_count):
+            parts = [snapshot['stages'][i] for snapshot in snapshots if i < len(snapshot['stages'])]
+            duration = max(part['duration'] for part in parts)
+            endpoints = _merge_endpoints(part['endpoints'] for part in parts)
+            report['stages'].append({'name': parts[0]['name'], **StatsCollector._report(endpoints, duration)})
+    return report
+
+
+def format_summary(report, label='Summary'):
+    """Human-readable lines for a report from StatsCollector"""
+    def line(name, stats):
+        latency = stats['latency']
+        text = (f"{name:<20} {stats['requests']:>8} req  {stats['rps']:>9.1f}/s  "
+                f"err {stats['error_rate'] * 100:5.1f}%")
+        if latency['count']:
+            text += (f"  p50 {latency['p50_ms']:.1f}ms  p95 {latency['p95_ms']:.1f}ms  "
+                     f"p99 {latency['p99_ms']:.1f}ms  max {latency['max_ms']:.1f}ms")
+        if stats['succeeded']:
+            text += f"  reuse {stats['connection_reuse'] * 100:.0f}%"
+        if stats['dropped']:
+            text += f"  dropped {stats['dropped']}"
+        return text
+
+    lines = [f"📊 {label} ({report['duration']:.1f}s)", '   ' + line('ALL', report)]
+    for name, stats in report['endpoints'].items():
+        lines.append('   ' + line(name, stats))
+    if report.get('stages'):
+        lines.append('   By stage:')
+        for stage in report['stages']:
+            lines.append('   ' + line(stage['name'][:20], stage) + f"  ({stage['duration']:.0f}s)")
+    return '\n'.join(lines)
+
+def write_report(report, path, fmt='json'):
+    """Write a final report as JSON (full detail) or CSV (one row per endpoint, then per stage)"""
+    if fmt == 'csv':
+        fields = ['endpoint', 'stage', 'duration', 'requests', 'rps', 'succeeded', 'failed', 'http_errors',
+                  'dropped', 'error_rate', 'new_connections', 'connection_reuse', 'mean_ms', 'min_ms', 'max_ms'] + [f'p{p:g}_ms' for p in PERCENTILES]
+        rows = [('ALL', None, report)] + [(name, None, stats) for name, stats in report['endpoints'].items()]
+        for stage in report.get('stages', []):
+            rows.append(('ALL', stage['name'], stage))
+            rows.extend((name, stage['name'], stats) for name, stats in stage['endpoints'].items())
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader()
+            for name, stage, stats in rows:
+                writer.writerow({**stats, **stats['latency'], 'endpoint': name, 'stage': stage or 'run'})
+    else:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -1,19 +1,68 @@
-import requests
 import time
 import os
+import signal
+import sys
 import threading
 import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from profiles import LoadProfile, load_profile
+from scenarios import ScenarioMix, load_mix, read_mix_config
+from sessions import connections_opened, new_session
+from stats import StatsCollector, format_summary, write_report
+
 TARGET_URL = os.getenv('TARGET_URL', 'http://webapp:8000')
 STRESS_LEVEL = os.getenv('STRESS_LEVEL', 'low').lower()
 
+# Load engine:
+#   closed - each thread waits for its response, then sleeps `delay` (original behaviour)
+#   open   - requests start on a fixed arrival schedule at the level's requests_per_second,
+#            whether or not earlier responses came back; latency is measured from the
+#            scheduled send time so a slow target cannot hide its queueing (coordinated omission)
+#   async  - open-loop from a single asyncio event loop and one keep-alive aiohttp session,
+#            for thousands of requests/sec from one container (TARGET_RPS=0: as fast as possible)
+# Unset, the level's 'engine' is used (closed when it has none).
+LOAD_ENGINE = os.getenv('LOAD_ENGINE', '').lower()
+ARRIVAL = os.getenv('ARRIVAL', 'constant').lower()    # open engine: constant or poisson
+TARGET_RPS = os.getenv('TARGET_RPS')                  # open engine: overrides requests_per_second
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 200))  # open engine: concurrent requests
+MAX_BACKLOG = int(os.getenv('MAX_BACKLOG', 5000))     # open engine: scheduled but not started yet
+CONCURRENCY = os.getenv('CONCURRENCY')                # async engine: overrides the level's concurrency
+LOG_REQUESTS = os.getenv('LOG_REQUESTS')              # 1/0, one line per request (default: on, off for async)
+
+# HTTP connections: every worker thread (and the async engine) keeps its
+# connections open between requests. HTTP_POOL_SIZE is the number kept per
+# thread (default 1, a thread has one request in flight) or by the async
+# engine (default CONCURRENCY). FORCE_NEW_CONNECTIONS=1 opens a new TCP
+# connection for every request, to measure what the handshakes cost.
+HTTP_POOL_SIZE = os.getenv('HTTP_POOL_SIZE')
+FORCE_NEW_CONNECTIONS = os.getenv('FORCE_NEW_CONNECTIONS', '0') == '1'
+
+# Statistics and report
+SUMMARY_INTERVAL = int(os.getenv('SUMMARY_INTERVAL', 10))  # seconds between summaries, 0 = off
+RUN_DURATION = int(os.getenv('RUN_DURATION', 0))           # stop after this many seconds, 0 = run until stopped
+REPORT_DIR = os.getenv('REPORT_DIR', 'reports')
+REPORT_FORMAT = os.getenv('REPORT_FORMAT', 'json').lower()  # json, csv or both
+
+# Load profile: ramp, steps, spike or soak (scaled from the level's rate),
+# inline JSON, or a path to a JSON file of stages (see profiles.py).
+# Runs on the open engine (or async) and ends the run when it is over.
+LOAD_PROFILE = os.getenv('LOAD_PROFILE')
+
+# Distributed mode (see distributed.py):
+#   standalone  - this container generates all the load (default)
+#   coordinator - hands out the plan above and a start time to workers, merges their results
+#   worker      - fetches the plan from COORDINATOR_URL and generates its share of the load
+LOAD_ROLE = os.getenv('LOAD_ROLE', 'standalone').lower()
+
 # Stress level configurations
 STRESS_CONFIG = {
     'low': {'threads': 2, 'requests_per_second': 5, 'delay': 0.2},
     'medium': {'threads': 5, 'requests_per_second': 20, 'delay': 0.05},
     'high': {'threads': 10, 'requests_per_second': 50, 'delay': 0.02},
-    'extreme': {'threads': 20, 'requests_per_second': 100, 'delay': 0.01}
+    'extreme': {'threads': 20, 'requests_per_second': 100, 'delay': 0.01},
+    'flood': {'threads': 50, 'requests_per_second': 3000, 'delay': 0, 'engine': 'async', 'concurrency': 500}
 }
 
 # Endpoints to test
@@ -25,26 +74,208 @@ ENDPOINTS = [
     '/db-test'
 ]
 
-def make_request(endpoint):
-    """Make a single HTTP request"""
+# Traffic mix: weighted endpoints and multi-step scenarios from a JSON file or
+# inline JSON (see scenarios.py). Unset, ENDPOINTS are hit uniformly.
+SCENARIOS = os.getenv('SCENARIOS')
+MIX = load_mix(SCENARIOS, ENDPOINTS)
+
+_local = threading.local()
+
+def get_session():
+    """This thread's persistent session, with its own keep-alive connection pool"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = new_session(int(HTTP_POOL_SIZE or 1), FORCE_NEW_CONNECTIONS)
+    return session
+
+def make_request(endpoint, method='GET', body=None, label=None, headers=None, parse_json=False):
+    """Make a single HTTP request
+
+    body is sent as JSON when it is a dict or list, as-is when it is a string.
+    """
     url = f"{TARGET_URL}{endpoint}"
+    label = label or endpoint
     try:
-        response = requests.get(url, timeout=5)
-        return {
-            'endpoint': endpoint,
+        session = get_session()
+        opened = connections_opened()
+        if isinstance(body, (dict, list)):
+            response = session.request(method, url, json=body, headers=headers, timeout=5)
+        else:
+            response = session.request(method, url, data=body, headers=headers, timeout=5)
+        result = {
+            'endpoint': label,
             'status': response.status_code,
             'time': response.elapsed.total_seconds(),
-            'success': True
+            'success': True,
+            'new_connection': connections_opened() > opened
         }
+        if parse_json:
+            try:
+                result['json'] = response.json()
+            except ValueError:
+                pass
+        return result
     except Exception as e:
         return {
-            'endpoint': endpoint,
+            'endpoint': label,
             'status': 0,
             'time': 0,
             'success': False,
             'error': str(e)
         }
 
+# Per-endpoint latency and error statistics for the whole run
+STATS = StatsCollector()
+log_requests = True
+
+def log_result(source, endpoint, result):
+    """Record a request and print one line for it"""
+    STATS.record(endpoint, result)
+    if not log_requests:
+        return
+    timestamp = datetime.now().strftime('%H:%M:%S')
+    
+    if result['success']:
+        print(f"[{timestamp}] {source} | {endpoint} | "
+              f"Status: {result['status']} | Time: {result['time']:.3f}s")
+    else:
+        print(f"[{timestamp}] {source} | {endpoint} | "
+              f"FAILED | Error: {result.get('error', 'Unknown')}")
+
+def run_scenario(source, scenario, intended=None):
+    """Run a scenario's steps in order, with think time between them
+
+    With `intended`, the first request's latency counts from its scheduled start.
+    """
+    context = scenario.new_context()
+    for i, step in enumerate(scenario.steps):
+        if i:
+            time.sleep(scenario.think(step))
+        try:
+            method, path, body = step.request(context)
+        except (KeyError, IndexError, ValueError) as e:
+            log_result(source, step.name, step.failed(f"cannot build request: missing {e}"))
+            return
+        
+        result = make_request(path, method, body, label=step.name, headers=step.headers,
+                              parse_json=bool(step.save))
+        if i == 0 and intended is not None:
+            # Response time as seen by a user who arrived on schedule
+            result['service_time'] = result['time']
+            result['time'] = time.perf_counter() - intended
+        log_result(source, step.name, result)
+        if not step.after(result, context):
+            return
+
+def next_interval(rate):
+    """Seconds until the next scheduled request"""
+    if rate <= 0:
+        return 0.1  # idle, check the rate again shortly
+    if ARRIVAL == 'poisson':
+        return random.expovariate(rate)
+    return 1.0 / rate
+
+def open_loop(rate_at):
+    """Start requests at rate_at(elapsed) per second regardless of how fast the target answers
+
+    Stops when rate_at returns None, after in-flight requests finish.
+    """
+    executor = ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT, thread_name_prefix='open-loop')
+    lock = threading.Lock()
+    state = {'backlog': 0, 'dropped': 0}
+    
+    def timed_scenario(scenario, intended):
+        with lock:
+            state['backlog'] -= 1
+        run_scenario('Open-loop', scenario, intended)
+    
+    start = intended = time.perf_counter()
+    try:
+        while True:
+            rate = rate_at(intended - start)
+            if rate is None:
+                break
+            intended += next_interval(rate)
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if rate <= 0:
+                continue
+            
+            scenario = MIX.choose()
+            with lock:
+                if state['backlog'] >= MAX_BACKLOG:
+                    # Client cannot keep up; record it instead of silently slowing down
+                    state['dropped'] += 1
+                    dropped = state['dropped']
+                else:
+                    state['backlog'] += 1
+                    dropped = None
+            
+            if dropped is not None:
+                endpoint = scenario.steps[0].name
+                log_result('Open-loop', endpoint, {
+                    'endpoint': endpoint,
+                    'success': False,
+                    'dropped': True,
+                    'error': f'client backlog full ({MAX_BACKLOG}), {dropped} dropped so far'
+                })
+                continue
+            executor.submit(timed_scenario, scenario, intended)
+    except KeyboardInterrupt:
+        # Stopped early: drop the queued backlog instead of sending it before exiting
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+
+def profile_rate(profile):
+    """rate_at() for the engines that follows a load profile and marks its stages"""
+    current = {'stage': None}
+    
+    def rate_at(elapsed):
+        at = profile.rate_at(elapsed)
+        if at is None:
+            return None
+        rate, index = at
+        if index != current['stage']:
+            current['stage'] = index
+            stage = profile.stages[index]
+            STATS.start_stage(stage['name'])
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] 🎚️  Stage {index + 1}/{len(profile.stages)}: "
+                  f"{stage['name']} for {stage['duration']:g}s", flush=True)
+        return rate
+    return rate_at
+
+def async_loop(rate, concurrency):
+    """Run the asyncio engine (aiohttp is only needed when it is selected)"""
+    import asyncio
+    from async_engine import AsyncLoadEngine
+    
+    engine = AsyncLoadEngine(
+        TARGET_URL,
+        MIX.choose,
+        log_result,
+        concurrency=concurrency,
+        rate=rate,
+        arrival=ARRIVAL,
+        max_backlog=MAX_BACKLOG,
+        pool_size=int(HTTP_POOL_SIZE or concurrency),
+        force_new_connections=FORCE_NEW_CONNECTIONS
+    )
+    
+    async def run():
+        # Signals cancel the engine from inside the loop instead of interrupting a request
+        main_task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGALRM):
+            loop.add_signal_handler(sig, main_task.cancel)
+        try:
+            await engine.run()
+        except asyncio.CancelledError:
+            print("\n🛑 Load generator stopped")
+    
+    asyncio.run(run())
+
 def worker_thread(thread_id, config):
     """Worker thread that generates load"""
     delay = config['delay']
@@ -52,53 +283,174 @@ def worker_thread(thread_id, config):
     print(f"[Thread-{thread_id}] Started with delay {delay}s")
     
     while True:
-        endpoint = random.choice(ENDPOINTS)
-        result = make_request(endpoint)
-        
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        
-        if result['success']:
-            print(f"[{timestamp}] Thread-{thread_id} | {endpoint} | "
-                  f"Status: {result['status']} | Time: {result['time']:.3f}s")
-        else:
-            print(f"[{timestamp}] Thread-{thread_id} | {endpoint} | "
-                  f"FAILED | Error: {result.get('error', 'Unknown')}")
+        run_scenario(f"Thread-{thread_id}", MIX.choose())
         
         time.sleep(delay)
 
-def main():
-    """Main load generator"""
+def summary_thread():
+    """Print a summary of the last SUMMARY_INTERVAL seconds"""
+    while True:
+        time.sleep(SUMMARY_INTERVAL)
+        label = f"[{datetime.now().strftime('%H:%M:%S')}] Last {SUMMARY_INTERVAL}s"
+        if STATS.stage:
+            label += f" | stage: {STATS.stage}"
+        print(format_summary(STATS.interval(), label), flush=True)
+
+def save_report(plan):
+    """Print the whole-run summary and write it to REPORT_DIR"""
+    report = STATS.report()
+    report.update({
+        'target': TARGET_URL,
+        'stress_level': plan['stress_level'],
+        'engine': plan['engine'],
+        'profile': plan['profile_name'],
+        'started_at': datetime.fromtimestamp(STATS.started_at).isoformat(timespec='seconds'),
+        'finished_at': datetime.now().isoformat(timespec='seconds')
+    })
+    print(format_summary(report, 'Run summary'))
+    write_reports(report, STATS.started_at)
+
+def write_reports(report, started_at):
+    """Write a report to REPORT_DIR in REPORT_FORMAT"""
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    name = f"load-report-{datetime.fromtimestamp(started_at).strftime('%Y%m%d-%H%M%S')}"
+    formats = ['json', 'csv'] if REPORT_FORMAT == 'both' else [REPORT_FORMAT]
+    for fmt in formats:
+        path = os.path.join(REPORT_DIR, f"{name}.{fmt}")
+        write_report(report, path, fmt)
+        print(f"📝 Report written to {path}")
+
+def stop(signum, frame):
+    """Turn SIGTERM (docker stop) and the RUN_DURATION alarm into a clean shutdown"""
+    raise KeyboardInterrupt
+
+def plan_from_env():
+    """Engine, rates, profile and traffic mix for this run, from the environment
+
+    In distributed mode the coordinator builds this and sends it to every worker.
+    """
     config = STRESS_CONFIG.get(STRESS_LEVEL, STRESS_CONFIG['low'])
+    engine = LOAD_ENGINE or config.get('engine', 'closed')
+    profile = load_profile(LOAD_PROFILE, config['requests_per_second']) if LOAD_PROFILE else None
+    if profile and engine == 'closed':
+        engine = 'open'  # a profile sets the arrival rate, which only the open-loop engines control
+    profile_name = None
+    if LOAD_PROFILE:
+        profile_name = 'inline JSON' if LOAD_PROFILE.lstrip().startswith(('[', '{')) else LOAD_PROFILE
+    return {
+        'stress_level': STRESS_LEVEL,
+        'engine': engine,
+        'threads': config['threads'],
+        'delay': config['delay'],
+        'rate': float(TARGET_RPS or config['requests_per_second']),
+        'concurrency': int(CONCURRENCY or config.get('concurrency', MAX_IN_FLIGHT)),
+        'profile': profile.spec if profile else None,
+        'profile_name': profile_name,
+        'scenarios': read_mix_config(SCENARIOS),
+        'run_duration': RUN_DURATION
+    }
+
+def run(plan, share=1.0, start_at=None, save=True):
+    """Generate load as described by `plan`
+
+    share scales the request rate (this process's part of a distributed run);
+    start_at is a wall-clock time to start at instead of waiting 10s.
+    """
+    global log_requests, MIX
+    engine = plan['engine']
+    rate = plan['rate'] * share
+    # The closed engine has no rate to split: a worker runs its share of the threads
+    threads = max(1, round(plan['threads'] * share))
+    concurrency = plan['concurrency']
+    profile = LoadProfile(plan['profile'], scale=share) if plan['profile'] else None
+    if plan['scenarios']:
+        MIX = ScenarioMix.from_config(plan['scenarios'])
+    log_requests = (LOG_REQUESTS or ('0' if engine == 'async' else '1')) == '1'
     
     print("=" * 60)
     print(f"🔥 Load Generator Started")
     print(f"Target: {TARGET_URL}")
-    print(f"Stress Level: {STRESS_LEVEL.upper()}")
-    print(f"Threads: {config['threads']}")
-    print(f"Requests/sec: ~{config['requests_per_second']}")
+    print(f"Stress Level: {plan['stress_level'].upper()}")
+    print(f"Engine: {engine}")
+    if FORCE_NEW_CONNECTIONS:
+        print("Connections: new TCP connection per request (FORCE_NEW_CONNECTIONS)")
+    if plan['scenarios']:
+        print("Traffic mix:")
+        for line in MIX.describe():
+            print(f"  {line}")
+    if profile:
+        print(f"Profile: {plan['profile_name']} ({profile.duration:g}s, "
+              f"up to {concurrency if engine == 'async' else MAX_IN_FLIGHT} in flight)")
+        for line in profile.describe():
+            print(f"  - {line}")
+    elif engine == 'open':
+        print(f"Requests/sec: {rate:g} ({ARRIVAL} arrivals, up to {MAX_IN_FLIGHT} in flight)")
+    elif engine == 'async':
+        if rate:
+            print(f"Requests/sec: {rate:g} ({ARRIVAL} arrivals, up to {concurrency} in flight)")
+        else:
+            print(f"Requests/sec: unthrottled ({concurrency} concurrent connections)")
+    else:
+        print(f"Threads: {threads}")
+        print(f"Requests/sec: ~{rate:g}")
     print("=" * 60)
     
-    # Wait for target to be ready
-    print("Waiting for target application to be ready...")
-    time.sleep(10)
-    
-    # Start worker threads
-    threads = []
-    for i in range(config['threads']):
-        t = threading.Thread(target=worker_thread, args=(i+1, config), daemon=True)
-        t.start()
-        threads.append(t)
-        time.sleep(0.5)  # Stagger thread starts
+    if start_at:
+        print(f"Starting at {datetime.fromtimestamp(start_at).strftime('%H:%M:%S')}...")
+        time.sleep(max(0.0, start_at - time.time()))
+    else:
+        # Wait for target to be ready
+        print("Waiting for target application to be ready...")
+        time.sleep(10)
     
-    print(f"\n✅ All {config['threads']} threads started!\n")
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGALRM, stop)
+    if plan['run_duration']:
+        signal.alarm(plan['run_duration'])
+    STATS.reset()
+    if SUMMARY_INTERVAL:
+        threading.Thread(target=summary_thread, daemon=True).start()
     
-    # Keep main thread alive
     try:
-        while True:
-            time.sleep(60)
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Load generator running...")
+        if engine == 'async':
+            async_loop(profile_rate(profile) if profile else rate, concurrency)
+        elif engine == 'open':
+            open_loop(profile_rate(profile) if profile else lambda elapsed: rate)
+        else:
+            # Start worker threads
+            for i in range(threads):
+                t = threading.Thread(target=worker_thread, args=(i+1, plan), daemon=True)
+                t.start()
+                time.sleep(0.5)  # Stagger thread starts
+            
+            print(f"\n✅ All {threads} threads started!\n")
+            
+            # Keep main thread alive
+            while True:
+                time.sleep(60)
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Load generator running...")
     except KeyboardInterrupt:
         print("\n🛑 Load generator stopped")
+    signal.alarm(0)
+    
+    if save:
+        save_report(plan)
+    else:
+        print(format_summary(STATS.report(), 'Run summary'))
+
+def main():
+    """Main load generator"""
+    if LOAD_ROLE == 'coordinator':
+        from distributed import run_coordinator
+        run_coordinator(plan_from_env())
+    elif LOAD_ROLE == 'worker':
+        from distributed import run_worker
+        run_worker()
+    else:
+        run(plan_from_env())
 
 if __name__ == '__main__':
+    # distributed.py does `import stress`; hand it this module rather than a second copy
+    # with its own STATS, MIX and sessions
+    sys.modules.setdefault('stress', sys.modules['__main__'])
     main()
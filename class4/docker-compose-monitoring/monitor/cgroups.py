@@ -0,0 +1,239 @@
+import os
+import threading
+import time
+
+# cgroup v2 sampling for the collector (STATS_SOURCE=cgroup).
+#
+# Reads a container's own cgroup files instead of going through the Docker
+# stats API, which makes a sample a handful of small file reads:
+#
+#   cpu.stat           usage_usec, nr_periods, nr_throttled, throttled_usec
+#   memory.current     memory.max, memory.stat (inactive_file is left out, like docker stats)
+#   io.stat            rbytes / wbytes per device
+#   *.pressure         cpu.pressure, memory.pressure, io.pressure (PSI "some" and "full" totals)
+#
+# Counters are cumulative, so CPU %, throttling and stall time over a window
+# are exact whatever the sampling rate. Reading every CGROUP_INTERVAL (well
+# under a second) adds the peaks within the window: the busiest slice of
+# CPU and the highest memory.current.
+#
+# The host's cgroup tree must be mounted into the monitor container
+# (CGROUP_ROOT). A container's cgroup is found from its ID, or from
+# /proc/<pid>/cgroup when the host's /proc is mounted too (PROC_ROOT, e.g.
+# /host/proc): the pid from the Docker API is a host pid, meaningless in
+# the monitor's own /proc.
+
+CGROUP_ROOT = os.getenv('CGROUP_ROOT', '/sys/fs/cgroup')
+PROC_ROOT = os.getenv('PROC_ROOT', '')   # the host's /proc, unset when not mounted
+CGROUP_INTERVAL = float(os.getenv('CGROUP_INTERVAL', 0.25))
+
+
+def read_flat(path):
+    """'key value' lines (cpu.stat, memory.stat) as a dict of ints"""
+    values = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(' ')
+            values[key] = int(value)
+    return values
+
+def read_int(path):
+    """A single-number file; None for 'max' (no limit)"""
+    with open(path) as f:
+        value = f.read().strip()
+    return None if value == 'max' else int(value)
+
+def read_io(path):
+    """(read bytes, written bytes) summed over every device in io.stat"""
+    read = written = 0
+    with open(path) as f:
+        for line in f:
+            for field in line.split()[1:]:
+                key, _, value = field.partition('=')
+                if key == 'rbytes':
+                    read += int(value)
+                elif key == 'wbytes':
+                    written += int(value)
+    return read, written
+
+def read_pressure(path):
+    """{'some': total usec, 'full': total usec} from a PSI file"""
+    totals = {'some': 0, 'full': 0}
+    with open(path) as f:
+        for line in f:
+            kind, *fields = line.split()
+            for field in fields:
+                if field.startswith('total='):
+                    totals[kind] = int(field[len('total='):])
+    return totals
+
+def host_memory():
+    """Host RAM in bytes, the limit of a container without memory.max"""
+    with open(os.path.join(PROC_ROOT or '/proc', 'meminfo')) as f:
+        for line in f:
+            if line.startswith('MemTotal:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def find_cgroup(container_id, pid=None, root=CGROUP_ROOT):
+    """Directory of a container's cgroup under root, or None
+
+    Tries the systemd driver layout, then the cgroupfs one, then the path
+    in /proc/<pid>/cgroup when the host's /proc is mounted at PROC_ROOT.
+    The root itself is never returned: its counters are the whole host's.
+    """
+    candidates = [f"system.slice/docker-{container_id}.scope", f"docker/{container_id}"]
+    if pid and PROC_ROOT:
+        try:
+            with open(os.path.join(PROC_ROOT, str(pid), 'cgroup')) as f:
+                for line in f:
+                    if line.startswith('0::'):
+                        candidates.append(line[3:].strip().lstrip('/'))
+        except OSError:
+            pass
+    for candidate in candidates:
+        path = os.path.join(root, candidate)
+        if os.path.realpath(path) == os.path.realpath(root):
+            continue
+        if os.path.exists(os.path.join(path, 'cpu.stat')):
+            return path
+    return None
+
+
+class CgroupReader:
+    """Reads one cgroup and turns its counters into per-window figures"""
+
+    def __init__(self, path):
+        self.path = path
+        self.memory_limit = read_int(os.path.join(path, 'memory.max')) or host_memory()
+        self._previous = None       # counters at the last read
+        self._window = None         # counters at the start of the window
+        self._cpu_peak = 0.0
+        self._memory_peak = 0
+
+    def _counters(self):
+        cpu = read_flat(os.path.join(self.path, 'cpu.stat'))
+        counters = {
+            'time': time.monotonic(),
+            'usage_usec': cpu['usage_usec'],
+            'nr_periods': cpu.get('nr_periods', 0),     # absent without a cpu.max quota
+            'nr_throttled': cpu.get('nr_throttled', 0),
+            'throttled_usec': cpu.get('throttled_usec', 0),
+            'memory': read_int(os.path.join(self.path, 'memory.current')),
+            'inactive_file': read_flat(os.path.join(self.path, 'memory.stat')).get('inactive_file', 0)
+        }
+        try:
+            counters['io_read'], counters['io_write'] = read_io(os.path.join(self.path, 'io.stat'))
+        except FileNotFoundError:
+            counters['io_read'] = counters['io_write'] = 0
+        for resource in ('cpu', 'memory', 'io'):
+            try:
+                pressure = read_pressure(os.path.join(self.path, f"{resource}.pressure"))
+            except OSError:
+                pressure = {'some': 0, 'full': 0}   # kernel without PSI
+            counters[f"{resource}_some"], counters[f"{resource}_full"] = pressure['some'], pressure['full']
+        return counters
+
+    def poll(self):
+        """Read the counters and update the window's peaks"""
+        counters = self._counters()
+        previous = self._previous
+        if previous is not None:
+            elapsed = counters['time'] - previous['time']
+            if elapsed > 0:
+                cpu = (counters['usage_usec'] - previous['usage_usec']) / (elapsed * 1e6) * 100
+                self._cpu_peak = max(self._cpu_peak, cpu)
+        self._memory_peak = max(self._memory_peak, counters['memory'])
+        self._previous = counters
+        if self._window is None:
+            self._window = counters
+
+    def take(self):
+        """Figures for the window since the previous take(), then start a new one; None before two reads"""
+        start, end = self._window, self._previous
+        if start is None or end is None or end['time'] <= start['time']:
+            return None
+        elapsed = end['time'] - start['time']
+        usec = elapsed * 1e6
+
+        def delta(key):
+            return max(end[key] - start[key], 0)
+
+        periods = delta('nr_periods')
+        used = max(end['memory'] - end['inactive_file'], 0)
+        figures = {
+            'cpu': delta('usage_usec') / usec * 100,
+            'memory': used / self.memory_limit * 100 if self.memory_limit else 0.0,
+            'mem_used': used,
+            'mem_limit': self.memory_limit,
+            'cpu_peak': self._cpu_peak,
+            'throttled_pct': delta('nr_throttled') / periods * 100 if periods else 0.0,
+            'throttled_ms': delta('throttled_usec') / 1000 / elapsed,        # ms throttled per second
+            'io_read_mbps': delta('io_read') / elapsed / 1e6,
+            'io_write_mbps': delta('io_write') / elapsed / 1e6,
+            'memory_peak_mb': self._memory_peak / 2 ** 20
+        }
+        # Share of the window in which some / all tasks were stalled on the resource
+        for resource in ('cpu', 'memory', 'io'):
+            for kind in ('some', 'full'):
+                figures[f"psi_{resource}_{kind}"] = delta(f"{resource}_{kind}") / usec * 100
+
+        self._window = end
+        self._cpu_peak = 0.0
+        self._memory_peak = end['memory']
+        return figures
+
+
+class CgroupSampler(threading.Thread):
+    """Polls a container's cgroup every CGROUP_INTERVAL
+
+    resolve() returns (container ID, pid) from the Docker API; it is called
+    again whenever the cgroup disappears (container stopped or recreated).
+    """
+
+    def __init__(self, container, resolve, interval=CGROUP_INTERVAL):
+        super().__init__(name=f'cgroup-{container}', daemon=True)
+        self.container = container
+        self.resolve = resolve
+        self.interval = interval
+        self.reader = None
+        self._lock = threading.Lock()
+        self._last_error = None
+
+    def take(self):
+        """Figures since the previous take(), or None when the cgroup is not readable"""
+        with self._lock:
+            return self.reader.take() if self.reader else None
+
+    def _warn(self, message):
+        if message != self._last_error:
+            print(f"⚠️  cgroup for {self.container}: {message}", flush=True)
+            self._last_error = message
+
+    def run(self):
+        while True:
+            if self.reader is None:
+                try:
+                    path = find_cgroup(*self.resolve())
+                    if path is None:
+                        raise LookupError(f"not found under {CGROUP_ROOT}")
+                    # Reads memory.max: fails if the container exits in the meantime
+                    reader = CgroupReader(path)
+                except Exception as e:
+                    self._warn(str(e))
+                    time.sleep(5)
+                    continue
+                with self._lock:
+                    self.reader = reader
+                self._last_error = None
+                print(f"📂 {self.container}: reading {path}", flush=True)
+            try:
+                with self._lock:
+                    self.reader.poll()
+            except (OSError, ValueError) as e:
+                self._warn(str(e))
+                with self._lock:
+                    self.reader = None
+                continue
+            time.sleep(self.interval)
@@ -0,0 +1,353 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote, urlparse
+
+from cgroups import CGROUP_INTERVAL, CGROUP_ROOT, CgroupSampler
+from records import encode, encode_cgroup, series_path
+
+# Metrics collector talking to the Docker Engine API (COLLECTOR=python).
+#
+# Replaces the monitor.sh loop, which forks docker stats --no-stream (about
+# 2 s per call), docker ps, curl and several cut pipelines every cycle:
+#
+# - CPU and memory come from the streaming stats endpoint
+#   (/containers/<name>/stats), one JSON document per second on a
+#   connection that stays open, and are computed the same way docker stats does
+# - container state comes from /containers/<name>/json on a persistent
+#   connection to /var/run/docker.sock
+# - the HTTP probe reuses one keep-alive connection to TARGET_URL
+#
+# Several containers can be watched at once: CONTAINERS lists them by name
+# and CONTAINER_LABEL adds every container carrying a label. Each one gets
+# its own stats stream thread and each TARGETS URL its own probe thread, so
+# the sampling interval does not grow with the number of targets. One
+# /containers/json call per sample gives the state of all of them.
+#
+# STATS_SOURCE=cgroup reads CPU and memory from each container's cgroup v2
+# files instead (see cgroups.py), several times a second, and adds PSI
+# stall time, CPU throttling and I/O in cgroup.rec / cgroup-<container>.rec.
+#
+# Every SAMPLE_INTERVAL a record per container is appended to its series
+# (metrics.rec for CONTAINER_NAME, metrics-<container>.rec for the others).
+# metrics.log and status.log follow CONTAINER_NAME in monitor.sh's format;
+# report.log and the console get an entry per container. Text entries are
+# written every LOG_INTERVAL.
+
+CONTAINER_NAME = os.getenv('CONTAINER_NAME', 'webapp')
+TARGET_URL = os.getenv('TARGET_URL', 'http://webapp:8000')
+LOG_DIR = os.getenv('LOG_DIR', '/logs')
+DOCKER_SOCKET = os.getenv('DOCKER_SOCKET', '/var/run/docker.sock')
+SAMPLE_INTERVAL = float(os.getenv('SAMPLE_INTERVAL', 1))
+LOG_INTERVAL = float(os.getenv('LOG_INTERVAL', 30))
+PROBE_TIMEOUT = float(os.getenv('PROBE_TIMEOUT', 5))
+STATS_SOURCE = os.getenv('STATS_SOURCE', 'docker')  # docker (stats API) | cgroup (cgroup v2 files)
+# Extra containers: comma-separated names, and/or a label ("key" or "key=value")
+CONTAINERS = [name.strip() for name in os.getenv('CONTAINERS', '').split(',') if name.strip()]
+CONTAINER_LABEL = os.getenv('CONTAINER_LABEL', '')
+# HTTP probes, "container=url,container=url"; defaults to CONTAINER_NAME=TARGET_URL
+TARGETS = dict(target.strip().split('=', 1) for target in
+               (os.getenv('TARGETS') or f"{CONTAINER_NAME}={TARGET_URL}").split(',') if target.strip())
+STATS_MAX_AGE = 5  # seconds without a stats document before CPU/memory read as 0
+
+METRICS_LOG = os.path.join(LOG_DIR, 'metrics.log')
+STATUS_LOG = os.path.join(LOG_DIR, 'status.log')
+REPORT_LOG = os.path.join(LOG_DIR, 'report.log')
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP over a unix socket, for the Docker Engine API"""
+
+    def __init__(self, socket_path, timeout=10):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DockerClient:
+    """Docker Engine API requests on one persistent connection"""
+
+    def __init__(self, socket_path=DOCKER_SOCKET):
+        self.socket_path = socket_path
+        self.conn = UnixHTTPConnection(socket_path)
+
+    def get_json(self, path):
+        """(status, decoded body) of a GET; reconnects once if the connection dropped"""
+        for attempt in range(2):
+            try:
+                self.conn.request('GET', path)
+                response = self.conn.getresponse()
+                return response.status, json.loads(response.read() or b'null')
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                if attempt:
+                    raise
+
+    def container_ids(self, container):
+        """(container ID, host pid) of a container"""
+        status, info = self.get_json(f'/containers/{container}/json')
+        if status != 200:
+            raise LookupError(f"container {container}: HTTP {status}")
+        return info['Id'], info['State'].get('Pid')
+
+    def container_states(self, names, label=''):
+        """{name: running} for the named containers plus every container carrying label
+
+        Named containers that do not exist are reported as not running.
+        """
+        states = {name: False for name in names}
+        path = '/containers/json?all=1'
+        if label:
+            path += '&filters=' + quote(json.dumps({'label': [label]}))
+        status, containers = self.get_json(path)
+        if status != 200:
+            raise http.client.HTTPException(f"HTTP {status} listing containers")
+        wanted = set(names)
+        for container in containers:
+            for name in container['Names']:
+                name = name.lstrip('/')
+                if label or name in wanted:
+                    states[name] = container['State'] == 'running'
+        if label:
+            # The label filter hides named containers without the label; look them up too
+            missing = [name for name in wanted if not states[name]]
+            if missing:
+                states.update({name: running for name, running in self.container_states(missing).items()})
+        return states
+
+
+def cpu_percent(stats):
+    """CPU % from one stats document, as docker stats computes it (100% = one core)"""
+    cpu, precpu = stats['cpu_stats'], stats.get('precpu_stats') or {}
+    cpu_delta = cpu['cpu_usage']['total_usage'] - precpu.get('cpu_usage', {}).get('total_usage', 0)
+    system_delta = cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0)
+    if not precpu.get('system_cpu_usage') or system_delta <= 0 or cpu_delta < 0:
+        return None
+    online_cpus = cpu.get('online_cpus') or len(cpu['cpu_usage'].get('percpu_usage') or []) or 1
+    return cpu_delta / system_delta * online_cpus * 100
+
+def memory_usage(stats):
+    """(used bytes, limit bytes), without the page cache, as docker stats reports it"""
+    memory = stats.get('memory_stats') or {}
+    if 'usage' not in memory:
+        return None
+    details = memory.get('stats', {})
+    # cgroup v2 reports inactive_file, v1 total_inactive_file
+    cache = details.get('inactive_file', details.get('total_inactive_file', 0))
+    return max(memory['usage'] - cache, 0), memory.get('limit', 0)
+
+def format_bytes(value):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if value < 1024 or unit == 'GiB':
+            return f"{value:.1f}{unit}" if unit != 'B' else f"{value:.0f}B"
+        value /= 1024
+
+
+class StatsStream(threading.Thread):
+    """Follows a container's streaming stats and keeps the latest CPU/memory figures"""
+
+    def __init__(self, container, socket_path=DOCKER_SOCKET):
+        super().__init__(name=f'stats-{container}', daemon=True)
+        self.container = container
+        self.socket_path = socket_path
+        self.latest = None  # {'cpu', 'memory', 'mem_used', 'mem_limit', 'received'}, replaced as a whole
+        self._last_error = None
+
+    def take(self):
+        """Latest figures, or None when the stream has been silent for STATS_MAX_AGE"""
+        latest = self.latest
+        if latest is None or time.monotonic() - latest['received'] > STATS_MAX_AGE:
+            return None
+        return latest
+
+    def run(self):
+        while True:
+            conn = UnixHTTPConnection(self.socket_path, timeout=STATS_MAX_AGE * 2)
+            try:
+                conn.request('GET', f'/containers/{self.container}/stats?stream=true')
+                response = conn.getresponse()
+                if response.status != 200:
+                    raise http.client.HTTPException(f"HTTP {response.status}: {response.read()[:200]!r}")
+                # One JSON document per line, about once a second
+                for line in iter(response.readline, b''):
+                    stats = json.loads(line)
+                    cpu, memory = cpu_percent(stats), memory_usage(stats)
+                    if cpu is None or memory is None:
+                        continue
+                    used, limit = memory
+                    self._last_error = None
+                    self.latest = {
+                        'cpu': cpu,
+                        'memory': used / limit * 100 if limit else 0.0,
+                        'mem_used': used,
+                        'mem_limit': limit,
+                        'received': time.monotonic()
+                    }
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                if str(e) != self._last_error:  # a stopped container fails the same way every second
+                    print(f"⚠️  Stats stream for {self.container}: {str(e)}", flush=True)
+                    self._last_error = str(e)
+            finally:
+                conn.close()
+            time.sleep(1)  # container stopped or daemon restarting
+
+
+class HttpProbe:
+    """GETs a URL on a keep-alive connection and times the full response"""
+
+    def __init__(self, url, timeout=PROBE_TIMEOUT):
+        parsed = urlparse(url)
+        self.path = parsed.path or '/'
+        connection_class = http.client.HTTPSConnection if parsed.scheme == 'https' else http.client.HTTPConnection
+        self.conn = connection_class(parsed.hostname, parsed.port, timeout=timeout)
+
+    def probe(self):
+        """(HTTP code as a 3-digit string, seconds); ('000', 0.0) when the request fails
+
+        A dropped connection is retried once on a new one, in case the server
+        closed the idle keep-alive connection; a timeout is not.
+        """
+        for attempt in range(2):
+            start = time.perf_counter()
+            try:
+                self.conn.request('GET', self.path)
+                response = self.conn.getresponse()
+                response.read()
+                return f"{response.status:03d}", time.perf_counter() - start
+            except (ConnectionError, http.client.RemoteDisconnected):
+                self.conn.close()
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                break
+        return '000', 0.0
+
+
+class ProbeThread(threading.Thread):
+    """Probes one URL every SAMPLE_INTERVAL on its own schedule, keeping the latest result"""
+
+    def __init__(self, container, url):
+        super().__init__(name=f'probe-{container}', daemon=True)
+        self.probe = HttpProbe(url)
+        self.latest = ('000', 0.0)
+
+    def run(self):
+        next_probe = time.monotonic()
+        while True:
+            self.latest = self.probe.probe()
+            next_probe += SAMPLE_INTERVAL
+            now = time.monotonic()
+            if next_probe < now:
+                next_probe = now  # a slow response delays only this target
+            time.sleep(next_probe - now)
+
+
+def append(path, data):
+    mode = 'ab' if isinstance(data, bytes) else 'a'
+    with open(path, mode) as f:
+        f.write(data)
+
+def write_logs(container, sample):
+    """Text log entries in monitor.sh's format"""
+    timestamp = datetime.fromtimestamp(sample['epoch']).strftime('%Y-%m-%d %H:%M:%S')
+    cpu = f"{sample['cpu']:.2f}%"
+    memory_percent = f"{sample['memory']:.2f}%"
+    memory = f"{format_bytes(sample['mem_used'])} / {format_bytes(sample['mem_limit'])}"
+    uptime = 'UP' if sample['up'] else 'DOWN'
+    latency = f"{sample['latency']:.6f}s"
+
+    if container == CONTAINER_NAME:
+        append(METRICS_LOG, f"{timestamp} | CPU: {cpu} | Memory: {memory_percent} | Latency: {latency}\n")
+        append(STATUS_LOG, f"{timestamp} | Container: {uptime} | HTTP: {sample['http_code']}\n")
+    append(REPORT_LOG, f"""[{timestamp}]
+Container: {container}
+Status: {uptime}
+CPU Usage: {cpu}
+Memory: {memory} ({memory_percent})
+HTTP Response: {sample['http_code']}
+Latency: {latency}
+---
+""")
+    pressure = ''
+    if 'throttled_pct' in sample:
+        pressure = (f" | Throttled: {sample['throttled_pct']:.1f}% | "
+                    f"PSI cpu/mem/io: {sample['psi_cpu_some']:.1f}/{sample['psi_memory_some']:.1f}/{sample['psi_io_some']:.1f}%")
+    print(f"[{timestamp}] {container:<16} CPU: {cpu} | Memory: {memory_percent} | Status: {uptime} | "
+          f"HTTP: {sample['http_code']} | Latency: {latency}{pressure}", flush=True)
+
+
+def start_sampler(container):
+    """Thread that keeps a container's CPU/memory figures, per STATS_SOURCE"""
+    if STATS_SOURCE == 'cgroup':
+        docker = DockerClient()  # one connection per thread
+        sampler = CgroupSampler(container, lambda: docker.container_ids(container))
+    else:
+        sampler = StatsStream(container)
+    sampler.start()
+    return sampler
+
+
+def main():
+    names = list(dict.fromkeys([CONTAINER_NAME] + CONTAINERS + list(TARGETS)))
+    print(f"Starting monitoring for containers: {', '.join(names)}"
+          + (f" + label {CONTAINER_LABEL}" if CONTAINER_LABEL else ''))
+    print(f"Targets: {', '.join(f'{name}={url}' for name, url in TARGETS.items())}")
+    print(f"Log directory: {LOG_DIR}")
+    print(f"Collector: python (Docker API on {DOCKER_SOCKET}), sample every {SAMPLE_INTERVAL:g}s, "
+          f"text logs every {LOG_INTERVAL:g}s", flush=True)
+    if STATS_SOURCE == 'cgroup':
+        print(f"Stats: cgroup v2 files under {CGROUP_ROOT}, read every {CGROUP_INTERVAL:g}s", flush=True)
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    docker = DockerClient()
+    samplers = {}
+    probes = {name: ProbeThread(name, url) for name, url in TARGETS.items()}
+    for probe in probes.values():
+        probe.start()
+    states = {name: False for name in names}
+
+    next_sample = time.monotonic()
+    next_log = next_sample
+    while True:
+        try:
+            states = docker.container_states(names, CONTAINER_LABEL)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            print(f"⚠️  Docker API: {str(e)}", flush=True)
+            states = {name: False for name in states}
+
+        epoch = int(time.time())
+        now = time.monotonic()
+        write_text = now >= next_log
+        for name, up in states.items():
+            if name not in samplers:
+                if name not in names:
+                    print(f"➕ Monitoring {name} (label {CONTAINER_LABEL})", flush=True)
+                samplers[name] = start_sampler(name)
+            stats = samplers[name].take() or {'cpu': 0.0, 'memory': 0.0, 'mem_used': 0, 'mem_limit': 0}
+            http_code, latency = probes[name].latest if name in probes else ('000', 0.0)
+
+            sample = dict(stats, epoch=epoch, up=up, http_code=http_code, latency=latency)
+            series = '' if name == CONTAINER_NAME else name
+            append(series_path(LOG_DIR, series), encode(epoch, sample['cpu'], sample['memory'], latency, http_code, up))
+            if 'throttled_pct' in sample:
+                append(series_path(LOG_DIR, series, 'cgroup'), encode_cgroup(epoch, sample))
+            if write_text:
+                write_logs(name, sample)
+        if write_text:
+            next_log = now + LOG_INTERVAL
+
+        # Fixed schedule; if a sample ran long, skip ahead rather than bunch up samples
+        next_sample += SAMPLE_INTERVAL
+        if next_sample < now:
+            next_sample = now + SAMPLE_INTERVAL
+        time.sleep(max(0.0, next_sample - time.monotonic()))
+
+if __name__ == '__main__':
+    main()
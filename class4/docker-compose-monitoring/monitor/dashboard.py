@@ -1,20 +1,28 @@
-from flask import Flask, render_template_string, jsonify
+from flask import Flask, Response, render_template_string, jsonify, request
 import os
 import subprocess
+import time
 from datetime import datetime
 
+from live import SSE_RETRY_MS, Broadcaster, TooManySubscribers
+from logtail import last_line as read_last_line, tail_lines
+from records import CGROUP_RECORD_SIZE, RecordFile, decode_cgroup, series_paths
+from tsdb import ALL_METRICS, TSDB_PATH, TimeSeriesStore, metric_name
+
 app = Flask(__name__)
 
 LOG_DIR = os.getenv('LOG_DIR', '/logs')
+CONTAINER_NAME = os.getenv('CONTAINER_NAME', 'webapp')  # the main series, metrics.rec
 METRICS_LOG = os.path.join(LOG_DIR, 'metrics.log')
 STATUS_LOG = os.path.join(LOG_DIR, 'status.log')
+METRICS_RECORDS = RecordFile(os.path.join(LOG_DIR, 'metrics.rec'))
+HISTORY_REFRESH = 60  # seconds; the rollups behind the history panel change at most once a minute
 
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
     <title>Container Monitoring Dashboard</title>
-    <meta http-equiv="refresh" content="10">
     <style>
         body {
             font-family: 'Courier New', monospace;
@@ -57,32 +65,84 @@ HTML_TEMPLATE = """
 <body>
     <div class="container">
         <h1>🔍 Container Monitoring Dashboard</h1>
-        <div class="refresh-info">Auto-refresh: 10s | Last update: {{ timestamp }}</div>
+        <div class="refresh-info">Live: <span id="live-state">connecting</span> | Last update: <span id="timestamp">{{ timestamp }}</span></div>
         
         <div class="metric-box">
             <h2>📊 Current Status</h2>
-            <p><strong>Container:</strong> <span class="{{ status_class }}">{{ container_status }}</span></p>
-            <p><strong>HTTP Response:</strong> {{ http_code }}</p>
-            <p><strong>CPU Usage:</strong> <span class="{{ cpu_class }}">{{ cpu_usage }}</span></p>
-            <p><strong>Memory Usage:</strong> <span class="{{ mem_class }}">{{ mem_usage }}</span></p>
-            <p><strong>Latency:</strong> {{ latency }}s</p>
+            <p><strong>Container:</strong> <span id="container_status" class="{{ status_class }}">{{ container_status }}</span></p>
+            <p><strong>HTTP Response:</strong> <span id="http_code">{{ http_code }}</span></p>
+            <p><strong>CPU Usage:</strong> <span id="cpu_usage" class="{{ cpu_class }}">{{ cpu_usage }}</span></p>
+            <p><strong>Memory Usage:</strong> <span id="mem_usage" class="{{ mem_class }}">{{ mem_usage }}</span></p>
+            <p><strong>Latency:</strong> <span id="latency">{{ latency }}</span>s</p>
+        </div>
+        
+        <div class="metric-box">
+            <h2>🐳 Containers</h2>
+            <pre id="containers">{{ containers }}</pre>
+        </div>
+        
+        <div class="metric-box">
+            <h2>⏱️ Pressure &amp; Throttling (cgroup)</h2>
+            <pre id="pressure">{{ pressure }}</pre>
         </div>
         
         <div class="metric-box">
             <h2>📈 Recent Metrics (Last 10 entries)</h2>
-            <pre>{{ recent_metrics }}</pre>
+            <pre id="recent_metrics">{{ recent_metrics }}</pre>
+        </div>
+        
+        <div class="metric-box">
+            <h2>📉 Last Hour (5-minute rollups)</h2>
+            <pre id="history">{{ history }}</pre>
         </div>
         
         <div class="metric-box">
             <h2>🚦 Status History (Last 10 entries)</h2>
-            <pre>{{ recent_status }}</pre>
+            <pre id="recent_status">{{ recent_status }}</pre>
         </div>
         
         <div class="metric-box">
             <h2>⚠️ Alerts</h2>
-            <pre>{{ alerts }}</pre>
+            <pre id="alerts">{{ alerts }}</pre>
         </div>
     </div>
+    <script>
+        // Panels are pushed by /stream when they change. EventSource reconnects by itself
+        // after a dropped stream, but gives up on an error status (503: too many viewers).
+        const byId = (id) => document.getElementById(id);
+        const touch = () => { byId('timestamp').textContent = new Date().toLocaleString(); };
+        const showPanel = (event) => {
+            byId(event.type).textContent = JSON.parse(event.data);
+            touch();
+        };
+        const showStatus = (event) => {
+            const status = JSON.parse(event.data);
+            for (const field of ['container_status', 'http_code', 'cpu_usage', 'mem_usage', 'latency', 'alerts']) {
+                byId(field).textContent = status[field];
+            }
+            byId('container_status').className = status.status_class;
+            byId('cpu_usage').className = status.cpu_class;
+            byId('mem_usage').className = status.mem_class;
+            touch();
+        };
+        function connect() {
+            const source = new EventSource('/stream');
+            source.onopen = () => { byId('live-state').textContent = 'connected'; };
+            source.onerror = () => {
+                if (source.readyState === EventSource.CLOSED) {
+                    byId('live-state').textContent = 'busy, retrying in 10s';
+                    setTimeout(connect, 10000);
+                } else {
+                    byId('live-state').textContent = 'reconnecting';
+                }
+            };
+            source.addEventListener('status', showStatus);
+            for (const panel of ['containers', 'pressure', 'recent_metrics', 'history', 'recent_status']) {
+                source.addEventListener(panel, showPanel);
+            }
+        }
+        connect();
+    </script>
 </body>
 </html>
 """
@@ -90,27 +150,30 @@ HTML_TEMPLATE = """
 def read_last_lines(filepath, n=10):
     """Read last n lines from a file"""
     try:
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
-            return ''.join(lines[-n:]) if lines else 'No data yet'
+        lines = tail_lines(filepath, n)
+        return ''.join(lines) if lines else 'No data yet'
     except FileNotFoundError:
         return 'Log file not found'
 
 def parse_latest_metrics():
     """Parse the latest metrics from logs"""
     try:
-        with open(METRICS_LOG, 'r') as f:
-            lines = f.readlines()
-            if lines:
-                last_line = lines[-1]
-                # Parse: "2024-01-09 10:30:00 | CPU: 25.5% | Memory: 40.2% | Latency: 0.125s"
-                parts = last_line.split('|')
-                
-                cpu = parts[1].split(':')[1].strip() if len(parts) > 1 else '0%'
-                mem = parts[2].split(':')[1].strip() if len(parts) > 2 else '0%'
-                latency = parts[3].split(':')[1].strip().replace('s', '') if len(parts) > 3 else '0.0'
-                
-                return cpu, mem, latency
+        # Structured records when the monitor writes them, the text log otherwise
+        records = METRICS_RECORDS.last()
+        if records:
+            record = records[0]
+            return f"{record['cpu']:.2f}%", f"{record['memory']:.2f}%", f"{record['latency']:.3f}"
+        
+        last_line = read_last_line(METRICS_LOG)
+        if last_line:
+            # Parse: "2024-01-09 10:30:00 | CPU: 25.5% | Memory: 40.2% | Latency: 0.125s"
+            parts = last_line.split('|')
+            
+            cpu = parts[1].split(':')[1].strip() if len(parts) > 1 else '0%'
+            mem = parts[2].split(':')[1].strip() if len(parts) > 2 else '0%'
+            latency = parts[3].split(':')[1].strip().replace('s', '') if len(parts) > 3 else '0.0'
+            
+            return cpu, mem, latency
     except:
         pass
     return '0%', '0%', '0.0'
@@ -118,20 +181,93 @@ def parse_latest_metrics():
 def parse_latest_status():
     """Parse the latest status from logs"""
     try:
-        with open(STATUS_LOG, 'r') as f:
-            lines = f.readlines()
-            if lines:
-                last_line = lines[-1]
-                parts = last_line.split('|')
-                
-                container_status = parts[1].split(':')[1].strip() if len(parts) > 1 else 'UNKNOWN'
-                http_code = parts[2].split(':')[1].strip() if len(parts) > 2 else '000'
-                
-                return container_status, http_code
+        records = METRICS_RECORDS.last()
+        if records:
+            return records[0]['container_status'], records[0]['http_code']
+        
+        last_line = read_last_line(STATUS_LOG)
+        if last_line:
+            parts = last_line.split('|')
+            
+            container_status = parts[1].split(':')[1].strip() if len(parts) > 1 else 'UNKNOWN'
+            http_code = parts[2].split(':')[1].strip() if len(parts) > 2 else '000'
+            
+            return container_status, http_code
     except:
         pass
     return 'UNKNOWN', '000'
 
+def latest_by_container():
+    """{container: latest record} for every series, the main container first"""
+    latest = {}
+    for series, path in sorted(series_paths(LOG_DIR).items(), key=lambda item: item[0] != ''):
+        records = RecordFile(path).last()
+        if records:
+            latest[series or CONTAINER_NAME] = records[0]
+    return latest
+
+def format_containers(latest):
+    """Text table with the latest sample of each container"""
+    if not latest:
+        return 'No data yet'
+    lines = [f"{'Container':<20} {'Status':<7} {'CPU':>8} {'Memory':>8} {'HTTP':>5} {'Latency':>9}  Sampled"]
+    for name, record in latest.items():
+        lines.append(f"{name:<20} {record['container_status']:<7} {record['cpu']:7.2f}% {record['memory']:7.2f}% "
+                     f"{record['http_code']:>5} {record['latency']:8.3f}s  {record['timestamp']}")
+    return '\n'.join(lines)
+
+def latest_cgroup_by_container():
+    """{container: latest cgroup record} for every series sampled with STATS_SOURCE=cgroup"""
+    latest = {}
+    for series, path in sorted(series_paths(LOG_DIR, 'cgroup').items(), key=lambda item: item[0] != ''):
+        records = RecordFile(path, CGROUP_RECORD_SIZE, decode_cgroup).last()
+        if records:
+            latest[series or CONTAINER_NAME] = records[0]
+    return latest
+
+def format_pressure(latest):
+    """Text table with the latest PSI, throttling and I/O figures of each container"""
+    if not latest:
+        return 'No cgroup samples (STATS_SOURCE=docker)'
+    lines = [f"{'Container':<20} {'CPU peak':>9} {'Throttled':>10} {'PSI cpu':>8} {'PSI mem':>8} {'PSI io':>8} "
+             f"{'Read':>9} {'Write':>9}"]
+    for name, record in latest.items():
+        lines.append(f"{name:<20} {record['cpu_peak']:8.1f}% {record['throttled_pct']:9.1f}% "
+                     f"{record['psi_cpu_some']:7.1f}% {record['psi_memory_some']:7.1f}% {record['psi_io_some']:7.1f}% "
+                     f"{record['io_read_mbps']:5.1f}MB/s {record['io_write_mbps']:5.1f}MB/s")
+    return '\n'.join(lines)
+
+def open_store():
+    """Read-only time-series store, or None before the first samples are ingested"""
+    if not os.path.exists(TSDB_PATH):
+        return None
+    return TimeSeriesStore(TSDB_PATH, readonly=True)
+
+def format_history(seconds=3600, resolution=300):
+    """Text table of CPU, memory and latency rollups over the last `seconds`"""
+    store = open_store()
+    if store is None:
+        return 'No history yet'
+    try:
+        start = time.time() - seconds
+        series = {metric: {point['ts']: point for point in store.query(metric, start, resolution=resolution)}
+                  for metric in ('cpu', 'memory', 'latency')}
+    finally:
+        store.close()
+    if not series['cpu']:
+        return 'No history yet'
+    
+    lines = [f"{'Time':<8} {'CPU avg / max':>17} {'Memory avg / max':>18} {'Latency avg / p95':>19}"]
+    for ts in sorted(series['cpu']):
+        cpu, mem, lat = series['cpu'][ts], series['memory'].get(ts), series['latency'].get(ts)
+        line = f"{datetime.fromtimestamp(ts).strftime('%H:%M'):<8} {cpu['avg']:6.1f}% / {cpu['max']:5.1f}%"
+        if mem:
+            line += f"  {mem['avg']:6.1f}% / {mem['max']:5.1f}%"
+        if lat:
+            line += f"  {lat['avg']:7.3f}s / {lat['p95']:6.3f}s"
+        lines.append(line)
+    return '\n'.join(lines)
+
 def get_alert_class(cpu_str, mem_str):
     """Determine alert class based on usage"""
     try:
@@ -182,34 +318,71 @@ def check_alerts(cpu, mem, latency, status, http_code):
     
     return '\n'.join(alerts)
 
-@app.route('/')
-def dashboard():
-    """Main dashboard view"""
+def current_status():
+    """Values of the Current Status and Alerts panels, from the latest sample"""
     cpu, mem, latency = parse_latest_metrics()
     container_status, http_code = parse_latest_status()
     
-    status_class = 'status-up' if container_status == 'UP' else 'status-down'
-    cpu_class = get_alert_class(cpu, '0%')
-    mem_class = get_alert_class('0%', mem)
-    
-    alerts = check_alerts(cpu, mem, latency, container_status, http_code)
-    
+    return {
+        'container_status': container_status,
+        'status_class': 'status-up' if container_status == 'UP' else 'status-down',
+        'http_code': http_code,
+        'cpu_usage': cpu,
+        'cpu_class': get_alert_class(cpu, '0%'),
+        'mem_usage': mem,
+        'mem_class': get_alert_class('0%', mem),
+        'latency': latency,
+        'alerts': check_alerts(cpu, mem, latency, container_status, http_code)
+    }
+
+def current_panels():
+    """Text of the table and log panels"""
+    return {
+        'containers': format_containers(latest_by_container()),
+        'pressure': format_pressure(latest_cgroup_by_container()),
+        'recent_metrics': read_last_lines(METRICS_LOG, 10),
+        'history': format_history(),
+        'recent_status': read_last_lines(STATUS_LOG, 10)
+    }
+
+_history = {'text': None, 'at': 0.0}
+
+def live_updates():
+    """Events for /stream; the broadcaster forwards only the ones that changed"""
+    yield 'status', current_status()
+    yield 'containers', format_containers(latest_by_container())
+    yield 'pressure', format_pressure(latest_cgroup_by_container())
+    yield 'recent_metrics', read_last_lines(METRICS_LOG, 10)
+    if time.time() - _history['at'] >= HISTORY_REFRESH:
+        _history['text'], _history['at'] = format_history(), time.time()
+    yield 'history', _history['text']
+    yield 'recent_status', read_last_lines(STATUS_LOG, 10)
+
+# Shared by every /stream client of this worker: one reader, however many viewers
+live = Broadcaster(live_updates)
+
+@app.route('/')
+def dashboard():
+    """Main dashboard view"""
     return render_template_string(
         HTML_TEMPLATE,
         timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        container_status=container_status,
-        status_class=status_class,
-        http_code=http_code,
-        cpu_usage=cpu,
-        cpu_class=cpu_class,
-        mem_usage=mem,
-        mem_class=mem_class,
-        latency=latency,
-        recent_metrics=read_last_lines(METRICS_LOG, 10),
-        recent_status=read_last_lines(STATUS_LOG, 10),
-        alerts=alerts
+        **current_status(),
+        **current_panels()
     )
 
+@app.route('/stream')
+def stream():
+    """Server-Sent Events with the dashboard panels, pushed when they change"""
+    try:
+        subscriber = live.subscribe()
+    except TooManySubscribers as e:
+        # Keep threads free for the page and the API; the browser tries again later
+        return Response(f"retry: {SSE_RETRY_MS}\n\n", status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(SSE_RETRY_MS // 1000), 'X-Error': str(e)})
+    return Response(live.events(subscriber), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/metrics')
 def api_metrics():
     """API endpoint for metrics"""
@@ -222,7 +395,46 @@ def api_metrics():
         'http_code': http_code,
         'cpu': cpu,
         'memory': mem,
-        'latency': latency
+        'latency': latency,
+        'containers': latest_by_container(),
+        'cgroup': latest_cgroup_by_container()
+    })
+
+@app.route('/api/history')
+def api_history():
+    """Time series of one metric: ?metric=cpu&container=webapp&range=3600&resolution=auto|0|60|300|3600"""
+    metric = request.args.get('metric', 'cpu')
+    if metric not in ALL_METRICS:
+        return jsonify({'error': f"unknown metric '{metric}'", 'metrics': list(ALL_METRICS)}), 400
+    container = request.args.get('container', CONTAINER_NAME)
+    series = '' if container == CONTAINER_NAME else container
+    try:
+        seconds = float(request.args.get('range', 3600))
+        resolution = request.args.get('resolution', 'auto')
+        if resolution != 'auto':
+            resolution = int(resolution)
+    except ValueError:
+        return jsonify({'error': 'range and resolution must be numbers'}), 400
+    
+    store = open_store()
+    if store is None:
+        return jsonify({'error': 'no history yet'}), 503
+    try:
+        end = time.time()
+        start = end - seconds
+        if resolution == 'auto':
+            resolution = store.pick_resolution(start, end)
+        points = store.query(metric_name(metric, series), start, end, resolution)
+    finally:
+        store.close()
+    
+    return jsonify({
+        'metric': metric,
+        'container': container,
+        'resolution': resolution,
+        'start': start,
+        'end': end,
+        'points': points
     })
 
 if __name__ == '__main__':
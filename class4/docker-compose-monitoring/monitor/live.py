@@ -0,0 +1,127 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# Live updates for the dashboard (Server-Sent Events on /stream).
+#
+# One reader thread per worker process calls poll() every LIVE_INTERVAL and
+# publishes what it returns. An event is encoded once and only when its data
+# changed since the last one of the same name, then put on the queue of
+# every connected browser. Reading the logs therefore costs the same with
+# one viewer or fifty; each viewer only costs a thread waiting on its queue.
+#
+# A new subscriber first gets the latest event of every name, so the page
+# is complete again after a reconnect. A subscriber whose queue fills up
+# (a stalled browser) is dropped; EventSource reconnects on its own.
+#
+# Under the gthread worker every open stream holds one of the worker's
+# SERVER_THREADS threads. At most SSE_MAX_CLIENTS streams are accepted so
+# some threads are always left for the page and the API; above that
+# subscribe() raises TooManySubscribers and /stream answers 503.
+
+LIVE_INTERVAL = float(os.getenv('LIVE_INTERVAL', 1))
+SSE_KEEPALIVE = float(os.getenv('SSE_KEEPALIVE', 15))
+SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', 100))
+SSE_MAX_CLIENTS = int(os.getenv('SSE_MAX_CLIENTS', max(int(os.getenv('SERVER_THREADS', 1)) - 8, 0)))
+SSE_RETRY_MS = 10000   # how long a refused browser waits before trying again
+
+
+class TooManySubscribers(Exception):
+    """Raised by subscribe() when SSE_MAX_CLIENTS streams are already open"""
+
+
+def encode_event(event, data):
+    """One SSE message: the event name and its data as a single JSON line"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Broadcaster:
+    """Runs poll() in one background thread and fans its changes out to every subscriber"""
+
+    def __init__(self, poll, interval=LIVE_INTERVAL, max_subscribers=SSE_MAX_CLIENTS):
+        self.poll = poll
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.subscribers = set()
+        self.latest = {}            # event name -> last message, replayed to new subscribers
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_running(self):
+        # The app is imported before gunicorn forks (preload) and threads do not
+        # survive a fork, so the reader starts in each worker on first use
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='live-reader', daemon=True)
+            self._thread.start()
+
+    def subscribe(self):
+        """A new subscriber queue, primed with the latest events; TooManySubscribers when full"""
+        subscriber = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+        with self._lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(f"{len(self.subscribers)} live streams already open")
+            self._ensure_running()
+            for message in self.latest.values():
+                subscriber.put_nowait(message)
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        """Send an event to every subscriber, unless it is the same as the previous one"""
+        message = encode_event(event, data)
+        with self._lock:
+            if self.latest.get(event) == message:
+                return
+            self.latest[event] = message
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    self.subscribers.discard(subscriber)
+                    self._close(subscriber)
+
+    @staticmethod
+    def _close(subscriber):
+        """Empty a subscriber's queue and leave the end-of-stream marker in it"""
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                break
+        subscriber.put_nowait(None)
+
+    def _run(self):
+        while True:
+            # Nothing to read while nobody is watching
+            if self.subscribers:
+                try:
+                    for event, data in self.poll():
+                        self.publish(event, data)
+                except Exception as e:
+                    print(f"❌ Live update error: {str(e)}", flush=True)
+            time.sleep(self.interval)
+
+    def events(self, subscriber):
+        """SSE stream for one subscriber: its messages as they come, a comment line while idle"""
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    message = subscriber.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    # Keeps proxies from closing the connection and finds clients that went away
+                    yield ': keep-alive\n\n'
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
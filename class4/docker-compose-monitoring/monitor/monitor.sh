@@ -11,10 +11,11 @@ LOG_DIR="/logs"
 METRICS_LOG="$LOG_DIR/metrics.log"
 STATUS_LOG="$LOG_DIR/status.log"
 REPORT_LOG="$LOG_DIR/report.log"
+METRICS_REC="$LOG_DIR/metrics.rec"
 
 # Initialize log files
 mkdir -p "$LOG_DIR"
-touch "$METRICS_LOG" "$STATUS_LOG" "$REPORT_LOG"
+touch "$METRICS_LOG" "$STATUS_LOG" "$REPORT_LOG" "$METRICS_REC"
 
 # Function: Get container stats
 get_container_stats() {
@@ -56,13 +57,26 @@ check_response() {
     fi
 }
 
+# Function: Append a fixed-width record to metrics.rec (see records.py)
+# Fields: epoch, CPU %, memory %, latency (s), HTTP code, up (1/0) - 42 bytes per line.
+# Values are clamped to their column width so every record keeps the same size.
+write_record() {
+    awk -v ts="$1" -v cpu="$2" -v mem="$3" -v latency="$4" -v code="$5" -v up="$6" '
+        function clamp(value, max) { value += 0; return value < 0 ? 0 : (value > max ? max : value) }
+        BEGIN {
+            printf "%10d %7.2f %7.2f %8.3f %03d %d\n", ts, clamp(cpu, 9999.99), clamp(mem, 9999.99),
+                clamp(latency, 9999.999), clamp(code, 999), up == "UP"
+        }' >> "$METRICS_REC"
+}
+
 # Main monitoring loop
 echo "Starting monitoring for container: $CONTAINER_NAME"
 echo "Target URL: $TARGET_URL"
 echo "Log directory: $LOG_DIR"
 
 while true; do
-    TIMESTAMP=$(date '+%Y-%m-%d %H:%M:%S')
+    EPOCH=$(date '+%s')
+    TIMESTAMP=$(date -d "@$EPOCH" '+%Y-%m-%d %H:%M:%S')
     
     # Get metrics
     STATS=$(get_container_stats "$CONTAINER_NAME")
@@ -82,6 +96,9 @@ while true; do
     # Log status
     echo "$TIMESTAMP | Container: $UPTIME | HTTP: $HTTP_CODE" >> "$STATUS_LOG"
     
+    # Structured record for the dashboard and alert service
+    write_record "$EPOCH" "$CPU" "$MEMORY_PERCENT" "$LATENCY" "$HTTP_CODE" "$UPTIME"
+    
     # Generate report entry
     cat >> "$REPORT_LOG" << EOF
 [$TIMESTAMP]